@@ -103,6 +103,16 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 DATABASES = {"default": dj_database_url.parse(os.environ.get("DATABASE_URL"))}
 
+# Cache shared by every web process and the cron commands, so a change
+# saved or a digest built in one process invalidates pages for all of
+# them. The table is created by `createcachetable` in the release phase.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+    }
+}
+
 # Use SQLite for testing instead of PostgreSQL
 import sys
 if 'test' in sys.argv or 'test_coverage' in sys.argv:
@@ -112,6 +122,12 @@ if 'test' in sys.argv or 'test_coverage' in sys.argv:
             'NAME': ':memory:',  # Use in-memory database for faster tests
         }
     }
+    # One process runs the tests, so a local memory cache is shared
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
     # Disable Cloudinary during tests to avoid issues with SQLite
     DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
     MEDIA_ROOT = BASE_DIR / 'test_media'
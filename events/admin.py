@@ -1,7 +1,17 @@
 from django.contrib import admin
-from .models import Event, Booking
+from .models import (
+    ArchivedBooking, ArchivedEvent, DigestSection, Event, Booking,
+    EventOccurrence, EventRecommendation, ScheduledJob, WaitlistEntry
+)
 
 # Register your models here.
 
 admin.site.register(Event)
 admin.site.register(Booking)
+admin.site.register(WaitlistEntry)
+admin.site.register(EventOccurrence)
+admin.site.register(ScheduledJob)
+admin.site.register(ArchivedEvent)
+admin.site.register(ArchivedBooking)
+admin.site.register(EventRecommendation)
+admin.site.register(DigestSection)
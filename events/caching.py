@@ -0,0 +1,92 @@
+import hashlib
+from django.core.cache import cache
+from django.utils import timezone
+
+# Version key bumped whenever an event changes. Every cached listing key
+# embeds the current version, so a bump orphans all of them at once.
+LISTING_VERSION_KEY = "events:listing-version"
+
+# Cached pages also live in a one-minute time bucket so events drop off
+# the upcoming listing at most a minute after they start.
+LISTING_BUCKET_SECONDS = 60
+
+
+def listing_version():
+    """Return the current version of the cached event listings."""
+    version = cache.get(LISTING_VERSION_KEY)
+    if version is None:
+        cache.add(LISTING_VERSION_KEY, 1, timeout=None)
+        version = cache.get(LISTING_VERSION_KEY, 1)
+    return version
+
+
+def bump_listing_version():
+    """Invalidate every cached event listing."""
+    try:
+        cache.incr(LISTING_VERSION_KEY)
+    except ValueError:
+        cache.set(LISTING_VERSION_KEY, 1, timeout=None)
+
+
+def upcoming_page_key(page_number, filters="", now=None):
+    """
+    Cache key for one page of the upcoming events listing.
+
+    ``filters`` is the normalised filter querystring, hashed so the key
+    stays short and safe for any cache backend.
+    """
+    digest = hashlib.md5(filters.encode()).hexdigest() if filters else "all"
+    return (
+        f"events:upcoming:v{listing_version()}:"
+        f"b{_bucket(now)}:f{digest}:p{page_number}"
+    )
+
+
+def filter_options_key(now=None):
+    """Cache key for the upcoming event counts behind the listing filters."""
+    return f"events:filter-options:v{listing_version()}:b{_bucket(now)}"
+
+
+def _bucket(now=None):
+    now = now or timezone.now()
+    return int(now.timestamp()) // LISTING_BUCKET_SECONDS
+
+
+# Month grids only change when events do, so they can live much longer
+CALENDAR_TIMEOUT_SECONDS = 60 * 60
+
+
+def calendar_month_key(year, month):
+    """Cache key for the per-day aggregates of one calendar month."""
+    return f"events:calendar:v{listing_version()}:{year}-{month:02d}"
+
+
+# Anonymous event pages are dropped whenever the event is saved, but seat
+# counts change without a save, so they also expire after a minute
+EVENT_PAGE_TIMEOUT_SECONDS = 60
+
+
+def event_page_key(slug):
+    """Cache key for the anonymous rendering of an event's detail page."""
+    digest = hashlib.md5(slug.encode()).hexdigest()
+    return f"events:page:{digest}"
+
+
+def invalidate_event_page(slug):
+    """Drop the cached anonymous page of an event."""
+    cache.delete(event_page_key(slug))
+
+
+# The digest is only refreshed by build_digest, which drops this key, so
+# the timeout is just a backstop
+DIGEST_TIMEOUT_SECONDS = 60 * 60
+
+
+def digest_key(week_start):
+    """Cache key for the served form of one week's digest."""
+    return f"events:digest:{week_start:%Y-%m-%d}"
+
+
+def invalidate_digest(week_start):
+    """Drop the cached digest of a week after its snapshot changes."""
+    cache.delete(digest_key(week_start))
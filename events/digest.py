@@ -0,0 +1,158 @@
+from datetime import datetime, time, timedelta
+from django.db.models import Count, Q
+from django.urls import reverse
+from django.utils import timezone
+from feed.models import Post
+from marketplace.models import Listing, SellingPost
+from .models import DIGEST_SECTIONS, DigestSection, Event
+
+# Entries kept per section
+DIGEST_EVENTS = 20
+DIGEST_LISTINGS = 10
+DIGEST_POSTS = 5
+
+
+def digest_week(now=None):
+    """Return the Monday of the week ``now`` falls in, in local time."""
+    today = timezone.localdate(now)
+    return today - timedelta(days=today.weekday())
+
+
+def _week_bounds(week_start):
+    start = timezone.make_aware(datetime.combine(week_start, time.min))
+    return start, start + timedelta(days=7)
+
+
+def _when(value):
+    return timezone.localtime(value).strftime("%a %d %b, %H:%M")
+
+
+def build_events(week_start):
+    """Published events taking place during the week, one per date."""
+    start, end = _week_bounds(week_start)
+    events = Event.objects.between(start, end).filter(status=1).only(
+        "title", "slug", "date", "location", "repeat", "repeat_until")
+    dates = sorted(
+        (
+            (occurrence, event)
+            for event in events
+            for occurrence in event.occurrences(start, end)
+        ),
+        key=lambda pair: pair[0],
+    )[:DIGEST_EVENTS]
+    return [
+        {
+            "title": event.title,
+            "url": reverse("events:event_detail", args=[event.slug]),
+            "location": event.location,
+            "starts_at": occurrence.isoformat(),
+            "when": _when(occurrence),
+        }
+        for occurrence, event in dates
+    ]
+
+
+def build_listings(week_start):
+    """Unsold auctions and items for sale added during the week."""
+    start, end = _week_bounds(week_start)
+    added = Q(created_at__gte=start, created_at__lt=end, is_sold=False)
+    listings = [
+        {
+            "title": listing.title,
+            "url": reverse("marketplace:listing_detail", args=[listing.pk]),
+            "price": str(listing.current_price or listing.starting_price),
+            "kind": "auction",
+            "added_at": listing.created_at.isoformat(),
+        }
+        for listing in Listing.objects.filter(added).only(
+            "title", "current_price", "starting_price", "created_at"
+        ).order_by("-created_at")[:DIGEST_LISTINGS]
+    ]
+    listings += [
+        {
+            "title": post.title,
+            "url": reverse(
+                "marketplace:selling_post_detail", args=[post.pk]),
+            "price": str(post.price),
+            "kind": "for sale",
+            "added_at": post.created_at.isoformat(),
+        }
+        for post in SellingPost.objects.filter(added).only(
+            "title", "price", "created_at"
+        ).order_by("-created_at")[:DIGEST_LISTINGS]
+    ]
+    listings.sort(key=lambda item: item["added_at"], reverse=True)
+    return listings[:DIGEST_LISTINGS]
+
+
+def build_posts(week_start):
+    """Accepted posts of the week with the most accepted comments."""
+    start, end = _week_bounds(week_start)
+    posts = (
+        Post.objects.filter(
+            accepted=True, created_on__gte=start, created_on__lt=end)
+        .annotate(
+            comment_count=Count("comments", filter=Q(comments__accepted=True)))
+        .order_by("-comment_count", "-created_on")
+        .values("id", "title", "comment_count")[:DIGEST_POSTS]
+    )
+    return [
+        {
+            "title": post["title"],
+            "url": reverse("feed:post_detail", args=[post["id"]]),
+            "comments": post["comment_count"],
+        }
+        for post in posts
+    ]
+
+
+SECTION_BUILDERS = {
+    "events": build_events,
+    "listings": build_listings,
+    "posts": build_posts,
+}
+
+
+def mark_stale(section, now=None):
+    """
+    Flag the current week's ``section`` for rebuilding. Costs one UPDATE
+    that matches nothing while the section is already stale.
+    """
+    DigestSection.objects.filter(
+        week_start__gte=digest_week(now), section=section, stale=False,
+    ).update(stale=True)
+
+
+def rebuild(week_start, now=None):
+    """
+    Build the week's missing and stale sections and return their names.
+
+    A section is marked fresh before it is built, so a change landing
+    while it is being built marks it stale again and the next run picks
+    it up.
+    """
+    now = now or timezone.now()
+    existing = set(
+        DigestSection.objects.filter(week_start=week_start)
+        .values_list("section", flat=True)
+    )
+    # A new week starts with every section stale
+    DigestSection.objects.bulk_create(
+        [
+            DigestSection(week_start=week_start, section=section)
+            for section, _ in DIGEST_SECTIONS if section not in existing
+        ],
+        ignore_conflicts=True,
+    )
+    rebuilt = []
+    stale = DigestSection.objects.filter(week_start=week_start, stale=True)
+    for digest_section in stale:
+        claimed = DigestSection.objects.filter(
+            pk=digest_section.pk, stale=True).update(stale=False)
+        if not claimed:
+            continue
+        items = SECTION_BUILDERS[digest_section.section](week_start)
+        DigestSection.objects.filter(pk=digest_section.pk).update(
+            items=items, built_at=now)
+        rebuilt.append(digest_section.section)
+    return rebuilt
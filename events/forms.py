@@ -1,46 +1,95 @@
 from django import forms
+from django.db.models import Max
+from django.utils import timezone
+from events.images import OptimisedImageField
 from events.models import Event
 from django.core.exceptions import ValidationError
 
-# Max upload size (bytes) -- 2MB
-MAX_IMAGE_UPLOAD_SIZE = 2 * 1024 * 1024
+
+def _to_minute(value):
+    return value.replace(second=0, microsecond=0)
 
 
 class HostEventForm(forms.ModelForm):
     class Meta:
         model = Event
-        fields = ('title', 'date', 'location', 'description', 'featured_image')
+        fields = (
+            'title', 'date', 'repeat', 'repeat_until', 'location',
+            'capacity', 'description', 'featured_image',
+        )
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'date': forms.DateTimeInput(
                 attrs={'type': 'datetime-local', 'class': 'form-control'}
             ),
+            'repeat': forms.Select(attrs={'class': 'form-select'}),
+            'repeat_until': forms.DateInput(
+                attrs={'type': 'date', 'class': 'form-control'}
+            ),
             'location': forms.TextInput(attrs={'class': 'form-control'}),
+            'capacity': forms.NumberInput(
+                attrs={'class': 'form-control', 'min': 1}
+            ),
             'description': forms.Textarea(
                 attrs={'class': 'form-control', 'cols': 4}),
             'featured_image': forms.ClearableFileInput(
                 attrs={'class': 'form-control'}
             ),
         }
+        # Photos are shrunk and re-encoded before they reach Cloudinary
+        field_classes = {'featured_image': OptimisedImageField}
+        help_texts = {
+            'capacity': "Leave blank for unlimited spaces.",
+            'repeat_until': "Leave blank to repeat indefinitely.",
+        }
+
+    def clean_capacity(self):
+        """Don't allow capacity below the number of seats already booked."""
+        capacity = self.cleaned_data.get("capacity")
+        if capacity is None:
+            return capacity
+        if capacity < 1:
+            raise ValidationError("Capacity must be at least 1.")
+        booked = self.instance.seats_taken
+        if self.instance.pk:
+            # Each upcoming date of a series has its own seat count
+            busiest = self.instance.occurrence_counters.filter(
+                starts_at__gte=timezone.now()
+            ).aggregate(busiest=Max("seats_taken"))["busiest"]
+            booked = max(booked, busiest or 0)
+        if capacity < booked:
+            raise ValidationError(
+                f"{booked} spaces are already booked, "
+                f"so capacity can't be lower than that."
+            )
+        return capacity
 
-    def clean_featured_image(self):
-        """Validate uploaded image size before sending to Cloudinary.
+    def clean(self):
+        cleaned_data = super().clean()
+        date = cleaned_data.get("date")
+        repeat_until = cleaned_data.get("repeat_until")
+        if not cleaned_data.get("repeat"):
+            cleaned_data["repeat_until"] = None
+        elif date and repeat_until and (
+                repeat_until < timezone.localtime(date).date()):
+            self.add_error(
+                "repeat_until", "The last date can't be before the first.")
 
-        If the image is larger than MAX_IMAGE_UPLOAD_SIZE we raise a
-        ValidationError with a friendly message. This prevents Cloudinary
-        rejecting the upload due to file size and gives the user a clear
-        instruction to reduce image dimensions or quality.
-        """
-        image = self.cleaned_data.get("featured_image")
-        if image:
-            # Some uploaded files might not have size attribute, guard for that
-            size = getattr(image, "size", None)
-            if size and size > MAX_IMAGE_UPLOAD_SIZE:
-                raise ValidationError(
-                    (
-                        f"Image file too large ({size // 1024}KB). "
-                        f"Please upload an image smaller than "
-                        f"{MAX_IMAGE_UPLOAD_SIZE // 1024}KB."
-                    )
-                )
-        return image
+        # Bookings and waitlist entries point at the event's dates, so
+        # those can't move under them
+        moved = []
+        if self.instance.pk:
+            # The form only edits to the minute
+            if date and _to_minute(date) != _to_minute(self.instance.date):
+                moved.append("date")
+            if cleaned_data.get("repeat", "") != self.instance.repeat:
+                moved.append("repeat")
+        if moved and (
+                self.instance.event_bookings.exists() or
+                self.instance.waitlist.exists()):
+            for field in moved:
+                self.add_error(
+                    field,
+                    "This can't be changed once people have booked or "
+                    "joined the waitlist.")
+        return cleaned_data
@@ -0,0 +1,108 @@
+import csv
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+# Bundled place-name -> coordinates table, so geocoding never needs the
+# network. Coordinates are approximate town centres.
+GAZETTEER_PATH = Path(__file__).resolve().parent / "data" / "gazetteer.csv"
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LATITUDE = 111.32
+
+RADIUS_CHOICES = (5, 10, 25, 50)
+DEFAULT_RADIUS_KM = 10
+
+
+@lru_cache(maxsize=1)
+def _gazetteer():
+    """
+    Load the gazetteer once per process.
+
+    Returns the place table keyed by lower-case name, holding the
+    canonical name and coordinates, and a single regex matching any place
+    name as a whole word, longest names first so "Newcastle upon Tyne"
+    wins over "Newcastle".
+    """
+    with open(GAZETTEER_PATH, newline="", encoding="utf-8") as handle:
+        places = {
+            row["name"].lower(): (
+                row["name"],
+                (float(row["latitude"]), float(row["longitude"])),
+            )
+            for row in csv.DictReader(handle)
+        }
+    names = sorted(places, key=len, reverse=True)
+    pattern = re.compile(
+        r"\b(?:%s)\b" % "|".join(re.escape(name) for name in names),
+        re.IGNORECASE,
+    )
+    return places, pattern
+
+
+def _lookup(location):
+    """
+    Return the gazetteer entry for free-text ``location`` or None.
+
+    Addresses usually end with the town, so the last place name found in
+    the text is used ("Bath Street, Leeds" is Leeds).
+    """
+    if not location:
+        return None
+    places, pattern = _gazetteer()
+    matches = pattern.findall(location)
+    if not matches:
+        return None
+    return places[matches[-1].lower()]
+
+
+def geocode(location):
+    """Return ``(latitude, longitude)`` for free-text ``location`` or None."""
+    place = _lookup(location)
+    return place and place[1]
+
+
+def place_name(location):
+    """Return the town named in free-text ``location``, or ``""``."""
+    place = _lookup(location)
+    return place[0] if place else ""
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return ``(min_lat, max_lat, min_lng, max_lng)`` around a point."""
+    lat_delta = radius_km / KM_PER_DEGREE_LATITUDE
+    lng_delta = radius_km / (
+        KM_PER_DEGREE_LATITUDE * max(math.cos(math.radians(latitude)), 0.01)
+    )
+    return (
+        latitude - lat_delta, latitude + lat_delta,
+        longitude - lng_delta, longitude + lng_delta,
+    )
+
+
+def near(queryset, latitude, longitude, radius_km):
+    """
+    Filter ``queryset`` to events within ``radius_km`` of a point.
+
+    The bounding box is matched first against the (latitude, longitude)
+    index, so only events in the box are checked with the haversine
+    distance, which is also annotated as ``distance_km``.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(
+        latitude, longitude, radius_km)
+    lat = Value(latitude, output_field=FloatField())
+    lng = Value(longitude, output_field=FloatField())
+    half_chord = (
+        Power(Sin(Radians(F("latitude") - lat) / 2), 2)
+        + Cos(Radians(lat)) * Cos(Radians(F("latitude")))
+        * Power(Sin(Radians(F("longitude") - lng) / 2), 2)
+    )
+    return queryset.filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lng, max_lng),
+    ).annotate(
+        distance_km=2 * EARTH_RADIUS_KM * ASin(Sqrt(half_chord)),
+    ).filter(distance_km__lte=radius_km)
@@ -0,0 +1,100 @@
+from datetime import timedelta, timezone as dt_timezone
+from django.core import signing
+from django.urls import reverse
+from .recurrence import rrule
+
+# Events have no end time, so calendar entries get a nominal length
+DEFAULT_EVENT_DURATION = timedelta(hours=1)
+
+# Rows fetched per round trip while streaming a feed
+FEED_CHUNK_SIZE = 200
+
+FEED_TOKEN_SALT = "events.calendar-feed"
+
+
+def feed_token(user):
+    """Signed token identifying ``user`` in their subscription URL."""
+    return signing.Signer(salt=FEED_TOKEN_SALT).sign(str(user.pk))
+
+
+def user_id_from_token(token):
+    """Return the user id in a feed token, or None if it was tampered."""
+    try:
+        return int(signing.Signer(salt=FEED_TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _escape(text):
+    return (
+        str(text).replace("\\", "\\\\").replace(";", "\\;")
+        .replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _timestamp(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _fold(line):
+    """Fold a content line into 75 octet pieces as RFC 5545 requires."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    pieces = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Don't split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        # Continuation lines start with a space, leaving 74 octets
+        limit = 74
+    return "\r\n ".join(pieces) + "\r\n"
+
+
+def vevent(event, request):
+    """Return the VEVENT block for an :model:`events.Event`."""
+    url = request.build_absolute_uri(
+        reverse("events:event_detail", args=[event.slug]))
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{event.pk}@{request.get_host()}",
+        f"DTSTAMP:{_timestamp(event.updated_on)}",
+        f"LAST-MODIFIED:{_timestamp(event.updated_on)}",
+        f"DTSTART:{_timestamp(event.date)}",
+        f"DTEND:{_timestamp(event.date + DEFAULT_EVENT_DURATION)}",
+    ]
+    rule = rrule(event.repeat, event.repeat_until)
+    if rule:
+        lines.append(f"RRULE:{rule}")
+    lines += [
+        f"SUMMARY:{_escape(event.title)}",
+        f"LOCATION:{_escape(event.location)}",
+        f"DESCRIPTION:{_escape(event.description)}",
+        f"URL:{url}",
+        "END:VEVENT",
+    ]
+    return "".join(_fold(line) for line in lines)
+
+
+def stream_calendar(events, request, name):
+    """
+    Yield an iCalendar document one event at a time.
+
+    ``events`` should be a lazy iterator (e.g. ``queryset.iterator()``)
+    so large feeds are never held in memory.
+    """
+    yield "".join(_fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Our Corner//Events//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ))
+    for event in events:
+        yield vevent(event, request)
+    yield "END:VCALENDAR\r\n"
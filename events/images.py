@@ -0,0 +1,94 @@
+from io import BytesIO
+from pathlib import Path
+from cloudinary.forms import CloudinaryFileField
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+# Uploads larger than this are refused before decoding. Full-size phone
+# photos fit comfortably; they are shrunk well below it before upload.
+MAX_IMAGE_UPLOAD_SIZE = 20 * 1024 * 1024
+
+# Longest side of a stored image, in pixels
+MAX_IMAGE_DIMENSION = 1600
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+
+def _output_format():
+    """WebP when this Pillow build can write it, otherwise JPEG."""
+    if features.check("webp"):
+        return "WEBP", "image/webp", ".webp"
+    return "JPEG", "image/jpeg", ".jpg"
+
+
+def optimise_image(upload):
+    """
+    Return ``upload`` downscaled and re-encoded, ready for Cloudinary.
+
+    The image is rotated upright from its EXIF orientation, shrunk so its
+    longest side is at most MAX_IMAGE_DIMENSION and re-encoded as WebP
+    (JPEG if WebP isn't available) without EXIF, GPS or ICC metadata.
+    JPEGs are decoded straight at a reduced scale, so a 12 megapixel
+    photo is never fully decoded. Animated images are passed through
+    untouched. Raises ValidationError for anything that isn't an image.
+    """
+    size = getattr(upload, "size", None)
+    if size and size > MAX_IMAGE_UPLOAD_SIZE:
+        raise ValidationError(
+            f"Image file too large ({size // 1024}KB). Please upload an "
+            f"image smaller than {MAX_IMAGE_UPLOAD_SIZE // (1024 * 1024)}MB."
+        )
+    try:
+        upload.seek(0)
+        image = Image.open(upload)
+        if getattr(image, "is_animated", False):
+            upload.seek(0)
+            return upload
+        # Ask the JPEG decoder for the smallest DCT scale that still
+        # covers the final size; other formats ignore this
+        scale = max(image.size) / MAX_IMAGE_DIMENSION
+        if scale > 1:
+            image.draft("RGB", (
+                int(image.width / scale), int(image.height / scale)))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(
+            (MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.LANCZOS)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError("Upload a valid image.")
+
+    image_format, content_type, extension = _output_format()
+    has_alpha = image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info)
+    if image_format == "WEBP":
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        options = {"quality": WEBP_QUALITY, "method": 2}
+    else:
+        image = image.convert("RGB")
+        options = {"quality": JPEG_QUALITY, "optimize": True}
+
+    output = BytesIO()
+    # Saving a fresh image without exif/icc_profile drops all metadata
+    image.save(output, image_format, **options)
+    name = Path(upload.name or "image").stem + extension
+    return SimpleUploadedFile(name, output.getvalue(), content_type)
+
+
+class OptimisedImageField(CloudinaryFileField):
+    """
+    Form field for a CloudinaryField that shrinks the upload with
+    optimise_image() during validation. The model field uploads the
+    result when the instance is saved.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Uploading here would send the original before it is shrunk
+        kwargs["autosave"] = False
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        value = super().to_python(value)
+        if isinstance(value, UploadedFile):
+            value = optimise_image(value)
+        return value
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from events.models import (
+    ArchivedBooking, ArchivedEvent, Booking, Event, ScheduledJob
+)
+
+JOB_NAME = "archive-events"
+JOB_INTERVAL = timedelta(days=1)
+
+# Events stay in the live table this long after they finish
+DEFAULT_RETENTION_DAYS = 90
+
+DEFAULT_BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    """
+    Move events that finished more than the retention window ago, with
+    their bookings, into :model:`events.ArchivedEvent` and
+    :model:`events.ArchivedBooking`.
+
+    Meant to run from cron; the job runs at most once a day. Each batch
+    copies and deletes its events in one transaction, so a crash leaves
+    every event either live or archived, never both.
+    """
+    help = "Archive events that finished more than --days days ago."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=DEFAULT_RETENTION_DAYS,
+            help="Keep events this many days after they finish.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Events archived per transaction.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even if the job isn't due yet.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        job = ScheduledJob.claim(
+            JOB_NAME, now, force=options["force"], interval=JOB_INTERVAL)
+        if job is None:
+            self.stdout.write("Archiving is not due yet.")
+            return
+
+        cutoff = now - timedelta(days=options["days"])
+        # One-off events by date, series once their last date has passed
+        finished = Event.objects.filter(
+            Q(repeat="", date__lt=cutoff) |
+            (~Q(repeat="") &
+             Q(repeat_until__lt=timezone.localdate(cutoff)))
+        )
+
+        archived = 0
+        while True:
+            with transaction.atomic():
+                events = list(
+                    finished.select_for_update(skip_locked=True)
+                    .order_by("pk")[:options["batch_size"]]
+                )
+                if not events:
+                    break
+                ArchivedEvent.objects.bulk_create(
+                    ArchivedEvent.from_event(event) for event in events)
+                ArchivedBooking.objects.bulk_create(
+                    ArchivedBooking.from_booking(booking)
+                    for booking in Booking.objects.filter(event__in=events)
+                )
+                # Bookings, waitlists and occurrence counters cascade
+                Event.objects.filter(
+                    pk__in=[event.pk for event in events]).delete()
+            archived += len(events)
+
+        job.finish(archived)
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {archived} events."))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from events.caching import invalidate_digest
+from events.digest import digest_week, rebuild
+from events.models import ScheduledJob
+
+JOB_NAME = "weekly-digest"
+
+
+class Command(BaseCommand):
+    """
+    Build the current week's "what's on" digest into
+    :model:`events.DigestSection` snapshots.
+
+    Meant to run from cron every minute. Only sections that are missing
+    or were marked stale by a content change are rebuilt, so most runs
+    do no work beyond one query. The cached digest page is dropped when
+    anything was rebuilt.
+    """
+    help = "Rebuild the stale sections of this week's digest."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even if the job isn't due yet.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        job = ScheduledJob.claim(JOB_NAME, now, force=options["force"])
+        if job is None:
+            self.stdout.write("The digest is not due yet.")
+            return
+
+        week_start = digest_week(now)
+        rebuilt = rebuild(week_start, now)
+        if rebuilt:
+            invalidate_digest(week_start)
+
+        job.finish(len(rebuilt))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(rebuilt)} digest sections."))
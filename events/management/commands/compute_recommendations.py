@@ -0,0 +1,69 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from events.models import Booking, Event, EventRecommendation, ScheduledJob
+from events.recommendations import co_booking_counts, top_neighbours
+
+JOB_NAME = "event-recommendations"
+JOB_INTERVAL = timedelta(hours=1)
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the "people who booked this also booked" lists stored in
+    :model:`events.EventRecommendation`.
+
+    Meant to run from cron; the job runs at most once an hour. Bookings
+    are streamed once, ordered by user, into sparse pair counts, and only
+    upcoming published events are recommended. The old lists are replaced
+    in one transaction so event pages never see a half-written set.
+    """
+    help = "Recompute co-booking recommendations for every event."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even if the job isn't due yet.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        job = ScheduledJob.claim(
+            JOB_NAME, now, force=options["force"], interval=JOB_INTERVAL)
+        if job is None:
+            self.stdout.write("Recommendations are not due yet.")
+            return
+
+        pairs = (
+            Booking.objects.order_by("user_id", "event_id")
+            .values_list("user_id", "event_id")
+            .iterator(chunk_size=2000)
+        )
+        counts, bookers = co_booking_counts(pairs)
+        candidates = set(
+            Event.objects.upcoming(now).filter(status=1)
+            .values_list("pk", flat=True)
+        )
+        neighbours = top_neighbours(counts, bookers, candidates)
+
+        with transaction.atomic():
+            EventRecommendation.objects.all().delete()
+            EventRecommendation.objects.bulk_create(
+                (
+                    EventRecommendation(
+                        event_id=event_id,
+                        recommended_id=neighbour,
+                        score=score,
+                        rank=rank,
+                    )
+                    for event_id, ranked in neighbours.items()
+                    for rank, (neighbour, score) in enumerate(ranked)
+                ),
+                batch_size=500,
+            )
+
+        job.finish(len(neighbours))
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored recommendations for {len(neighbours)} events."))
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from events.models import Booking, Event, EventOccurrence
+
+
+def _actual(bookings, aggregate):
+    """Coalesced subquery aggregating ``bookings`` of one counter row."""
+    return Coalesce(
+        Subquery(
+            bookings.order_by()
+            .values("event")
+            .annotate(total=aggregate)
+            .values("total")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    """
+    Recompute the denormalized booking_count and seats_taken columns on
+    :model:`events.Event` and :model:`events.EventOccurrence` from the
+    :model:`events.Booking` table.
+    """
+    help = "Fix events whose booking counters drifted from their bookings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted events without updating them.",
+        )
+
+    def handle(self, *args, **options):
+        # One-off events count on the event row, each booked date of a
+        # series on its EventOccurrence row
+        counters = (
+            (
+                Event.objects.select_related("host"),
+                Booking.objects.filter(
+                    event=OuterRef("pk"), occurrence__isnull=True),
+                "events",
+            ),
+            (
+                EventOccurrence.objects.select_related("event__host"),
+                Booking.objects.filter(
+                    event=OuterRef("event"),
+                    occurrence=OuterRef("starts_at")),
+                "occurrences",
+            ),
+        )
+        for rows, bookings, label in counters:
+            actual = {
+                "booking_count": _actual(bookings, Count("pk")),
+                "seats_taken": _actual(bookings, Sum("seats")),
+            }
+            drifted = rows.annotate(
+                actual_bookings=actual["booking_count"],
+                actual_seats=actual["seats_taken"],
+            ).filter(
+                ~Q(booking_count=F("actual_bookings")) |
+                ~Q(seats_taken=F("actual_seats"))
+            )
+
+            if options["dry_run"]:
+                for row in drifted:
+                    self.stdout.write(
+                        f"{row}: {row.booking_count} bookings -> "
+                        f"{row.actual_bookings}, {row.seats_taken} seats "
+                        f"-> {row.actual_seats}"
+                    )
+                continue
+
+            fixed = rows.model.objects.filter(
+                pk__in=drifted.values("pk")
+            ).update(**actual)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Reconciled booking counts for {fixed} {label}.")
+            )
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_seats_taken(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Booking = apps.get_model('events', 'Booking')
+    counts = (
+        Booking.objects.values('event_id')
+        .annotate(total=models.Count('id'))
+        .values_list('event_id', 'total')
+    )
+    for event_id, total in counts.iterator():
+        Event.objects.filter(pk=event_id).update(seats_taken=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0004_event_events_even_status_d859e9_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='seats_taken',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='events.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_waitlists', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['joined_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(fields=('event', 'user'), name='unique_waitlist_entry'),
+        ),
+        migrations.RunPython(
+            backfill_seats_taken, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:03
+
+from django.db import migrations, models
+
+
+def backfill_booking_count(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Booking = apps.get_model('events', 'Booking')
+    counts = (
+        Booking.objects.values('event_id')
+        .annotate(total=models.Count('id'))
+        .values_list('event_id', 'total')
+    )
+    for event_id, total in counts.iterator():
+        Event.objects.filter(pk=event_id).update(booking_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_event_capacity_event_seats_taken_waitlistentry_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='booking_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(
+            backfill_booking_count, migrations.RunPython.noop),
+    ]
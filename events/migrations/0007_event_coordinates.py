@@ -0,0 +1,144 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:09
+
+import re
+from django.db import migrations, models
+
+# Gazetteer as it was when this migration was written, so later
+# changes to events.geocoding can't change what it backfills
+PLACES = (
+    ('Aberdeen', 57.1497, -2.0943),
+    ('Bath', 51.3811, -2.359),
+    ('Belfast', 54.5973, -5.9301),
+    ('Birmingham', 52.4862, -1.8904),
+    ('Blackpool', 53.8175, -3.0357),
+    ('Bolton', 53.5769, -2.4282),
+    ('Bournemouth', 50.7192, -1.8808),
+    ('Bradford', 53.796, -1.7594),
+    ('Brighton', 50.8225, -0.1372),
+    ('Bristol', 51.4545, -2.5879),
+    ('Cambridge', 52.2053, 0.1218),
+    ('Canterbury', 51.2802, 1.0789),
+    ('Cardiff', 51.4816, -3.1791),
+    ('Carlisle', 54.8925, -2.9329),
+    ('Cheltenham', 51.8994, -2.0783),
+    ('Chester', 53.193, -2.8931),
+    ('Colchester', 51.8959, 0.8919),
+    ('Coventry', 52.4068, -1.5197),
+    ('Derby', 52.9225, -1.4746),
+    ('Derry', 54.9966, -7.3086),
+    ('Doncaster', 53.5228, -1.1285),
+    ('Dundee', 56.462, -2.9707),
+    ('Durham', 54.7761, -1.5733),
+    ('Edinburgh', 55.9533, -3.1883),
+    ('Exeter', 50.7184, -3.5339),
+    ('Glasgow', 55.8642, -4.2518),
+    ('Gloucester', 51.8642, -2.2382),
+    ('Guildford', 51.2362, -0.5704),
+    ('Huddersfield', 53.6458, -1.785),
+    ('Hull', 53.7676, -0.3274),
+    ('Inverness', 57.4778, -4.2247),
+    ('Ipswich', 52.0567, 1.1482),
+    ('Kingston upon Hull', 53.7676, -0.3274),
+    ('Lancaster', 54.0466, -2.8007),
+    ('Leeds', 53.8008, -1.5491),
+    ('Leicester', 52.6369, -1.1398),
+    ('Lincoln', 53.2307, -0.5406),
+    ('Liverpool', 53.4084, -2.9916),
+    ('London', 51.5074, -0.1278),
+    ('Londonderry', 54.9966, -7.3086),
+    ('Luton', 51.8787, -0.42),
+    ('Maidstone', 51.2704, 0.5227),
+    ('Manchester', 53.4808, -2.2426),
+    ('Middlesbrough', 54.5742, -1.235),
+    ('Milton Keynes', 52.0406, -0.7594),
+    ('Newcastle', 54.9783, -1.6178),
+    ('Newcastle upon Tyne', 54.9783, -1.6178),
+    ('Newport', 51.5842, -2.9977),
+    ('Northampton', 52.2405, -0.9027),
+    ('Norwich', 52.6309, 1.2974),
+    ('Nottingham', 52.9548, -1.1581),
+    ('Oxford', 51.752, -1.2577),
+    ('Perth', 56.395, -3.4308),
+    ('Peterborough', 52.5695, -0.2405),
+    ('Plymouth', 50.3755, -4.1427),
+    ('Portsmouth', 50.8198, -1.088),
+    ('Preston', 53.7632, -2.7031),
+    ('Reading', 51.4543, -0.9781),
+    ('Salisbury', 51.0688, -1.7945),
+    ('Sheffield', 53.3811, -1.4701),
+    ('Slough', 51.5105, -0.595),
+    ('Southampton', 50.9097, -1.4044),
+    ('Stirling', 56.1165, -3.9369),
+    ('Stoke-on-Trent', 53.0027, -2.1794),
+    ('Sunderland', 54.9069, -1.3838),
+    ('Swansea', 51.6214, -3.9436),
+    ('Swindon', 51.5558, -1.7797),
+    ('Truro', 50.2632, -5.051),
+    ('Wakefield', 53.6833, -1.4977),
+    ('Warrington', 53.39, -2.597),
+    ('Watford', 51.6565, -0.3903),
+    ('Wigan', 53.545, -2.6325),
+    ('Winchester', 51.0632, -1.308),
+    ('Wolverhampton', 52.587, -2.1288),
+    ('Worcester', 52.192, -2.22),
+    ('Wrexham', 53.0462, -2.993),
+    ('York', 53.96, -1.0873),
+)
+
+PLACE_BY_NAME = {place[0].lower(): place for place in PLACES}
+# Longest names first, so "Newcastle upon Tyne" beats "Newcastle"
+PLACE_PATTERN = re.compile(
+    r"\b(?:%s)\b" % "|".join(
+        re.escape(name)
+        for name in sorted(PLACE_BY_NAME, key=len, reverse=True)
+    ),
+    re.IGNORECASE,
+)
+
+
+def lookup(location):
+    """
+    Return ``(name, latitude, longitude)`` for the last place named in
+    ``location``, or None.
+    """
+    matches = PLACE_PATTERN.findall(location or "")
+    return PLACE_BY_NAME[matches[-1].lower()] if matches else None
+
+
+def backfill_coordinates(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    batch = []
+    for event in Event.objects.only('location').iterator(chunk_size=500):
+        place = lookup(event.location)
+        event.latitude, event.longitude = place[1:] if place else (None, None)
+        batch.append(event)
+        if len(batch) == 500:
+            Event.objects.bulk_update(batch, ['latitude', 'longitude'])
+            batch = []
+    Event.objects.bulk_update(batch, ['latitude', 'longitude'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_event_booking_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['latitude', 'longitude'], name='events_even_latitud_fbe0e6_idx'),
+        ),
+        migrations.RunPython(
+            backfill_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_event_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('seats_taken', models.PositiveIntegerField(default=0)),
+                ('booking_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['starts_at'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='waitlistentry',
+            name='unique_waitlist_entry',
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='occurrence',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='repeat',
+            field=models.CharField(blank=True, choices=[('', 'Does not repeat'), ('weekly', 'Every week'), ('fortnightly', 'Every two weeks'), ('monthly', 'Every month')], default='', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='repeat_until',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='occurrence',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('occurrence__isnull', True)), fields=('event', 'user'), name='unique_waitlist_entry'),
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('occurrence__isnull', False)), fields=('event', 'occurrence', 'user'), name='unique_occurrence_waitlist_entry'),
+        ),
+        migrations.AddField(
+            model_name='eventoccurrence',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrence_counters', to='events.event'),
+        ),
+        migrations.AddConstraint(
+            model_name='eventoccurrence',
+            constraint=models.UniqueConstraint(fields=('event', 'starts_at'), name='unique_occurrence'),
+        ),
+    ]
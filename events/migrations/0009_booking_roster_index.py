@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_recurring_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['event', 'booked_at', 'id'], name='events_book_event_i_803acd_idx'),
+        ),
+    ]
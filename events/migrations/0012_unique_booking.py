@@ -0,0 +1,64 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:29
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+from django.db.models.functions import Greatest
+
+BATCH_SIZE = 500
+
+
+def remove_duplicate_bookings(apps, schema_editor):
+    """
+    Keep the earliest booking of each (event, occurrence, user) and
+    delete the rest in batches, giving back the seats they held.
+    """
+    Booking = apps.get_model('events', 'Booking')
+    Event = apps.get_model('events', 'Event')
+    EventOccurrence = apps.get_model('events', 'EventOccurrence')
+
+    duplicates = (
+        Booking.objects.order_by()
+        .values('event', 'occurrence', 'user')
+        .annotate(total=Count('id'), keep=Min('id'))
+        .filter(total__gt=1)
+    )
+    doomed = []
+    for group in duplicates.iterator():
+        extra = group['total'] - 1
+        if group['occurrence'] is None:
+            counters = Event.objects.filter(pk=group['event'])
+        else:
+            counters = EventOccurrence.objects.filter(
+                event=group['event'], starts_at=group['occurrence'])
+        counters.update(
+            seats_taken=Greatest(F('seats_taken') - extra, 0),
+            booking_count=Greatest(F('booking_count') - extra, 0),
+        )
+        doomed += Booking.objects.filter(
+            event=group['event'], occurrence=group['occurrence'],
+            user=group['user'],
+        ).exclude(pk=group['keep']).values_list('pk', flat=True)
+        if len(doomed) >= BATCH_SIZE:
+            Booking.objects.filter(pk__in=doomed).delete()
+            doomed = []
+    Booking.objects.filter(pk__in=doomed).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_event_listing_filters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('occurrence__isnull', True)), fields=('event', 'user'), name='unique_booking'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('occurrence__isnull', False)), fields=('event', 'occurrence', 'user'), name='unique_occurrence_booking'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0012_unique_booking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='seats',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0014_event_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='events.event')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='events.event')),
+            ],
+            options={
+                'ordering': ['event', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='eventrecommendation',
+            constraint=models.UniqueConstraint(fields=('event', 'rank'), name='unique_recommendation_rank'),
+        ),
+    ]
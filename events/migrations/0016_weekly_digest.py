@@ -0,0 +1,31 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0015_event_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField()),
+                ('section', models.CharField(choices=[('events', "What's on"), ('listings', 'New in the marketplace'), ('posts', 'Top posts')], max_length=12)),
+                ('items', models.JSONField(default=list)),
+                ('stale', models.BooleanField(default=True)),
+                ('built_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['week_start', 'section'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='digestsection',
+            constraint=models.UniqueConstraint(fields=('week_start', 'section'), name='unique_digest_section'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0016_weekly_digest'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='events_book_occurre_743044_idx',
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('occurrence__isnull', True), ('reminder_sent_at__isnull', True)), fields=['event'], name='booking_unreminded_event'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('occurrence__isnull', False), ('reminder_sent_at__isnull', True)), fields=['occurrence'], name='booking_unreminded_occurrence'),
+        ),
+    ]
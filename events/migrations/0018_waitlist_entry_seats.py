@@ -0,0 +1,46 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:28
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_bookings(Booking, **match):
+    return Coalesce(
+        models.Subquery(
+            Booking.objects.filter(**match)
+            .order_by()
+            .values('event')
+            .annotate(total=models.Count('id'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def backfill_booking_count(apps, schema_editor):
+    # booking_count used to move by seats; it counts bookings again
+    Event = apps.get_model('events', 'Event')
+    EventOccurrence = apps.get_model('events', 'EventOccurrence')
+    Booking = apps.get_model('events', 'Booking')
+    Event.objects.update(booking_count=count_bookings(
+        Booking, event=models.OuterRef('pk'), occurrence__isnull=True))
+    EventOccurrence.objects.update(booking_count=count_bookings(
+        Booking, event=models.OuterRef('event'),
+        occurrence=models.OuterRef('starts_at')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0017_unreminded_booking_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='seats',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunPython(
+            backfill_booking_count, migrations.RunPython.noop),
+    ]
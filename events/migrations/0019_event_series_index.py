@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0018_waitlist_entry_seats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('repeat', ''), _negated=True), fields=['status', 'date'], name='event_series_date'),
+        ),
+    ]
@@ -1,13 +1,81 @@
-from django.db import models
+import re
+from datetime import timedelta
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest, Length
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.text import slugify
 from cloudinary.models import CloudinaryField
+from .geocoding import geocode, place_name
+from .recurrence import REPEAT_CHOICES, expand, next_occurrence
 
 STATUS = ((0, "Draft"), (1, "Published"))
 
+# Denormalized counters that are only written with atomic UPDATEs. A
+# regular save() of an existing event leaves them alone so a stale
+# instance (e.g. from the edit form) can't overwrite concurrent changes.
+COUNTER_FIELDS = ("seats_taken", "booking_count")
+
+# How many times save() picks a new slug after losing a race for one
+SLUG_ATTEMPTS = 5
+
+# Outcomes of Event.book() and book_many()
+BOOKED = "booked"
+ALREADY_BOOKED = "already_booked"
+WAITLISTED = "waitlisted"
+FULL = "full"
+
+# Most seats one booking can hold, e.g. for a family
+MAX_BOOKING_SEATS = 10
+
+# book_many() retries once if a concurrent request inserts a duplicate
+BOOK_MANY_ATTEMPTS = 2
+
+
+class EventFull(Exception):
+    """Raised inside Event.book() to roll back a booking with no seat."""
+
 # Create your models here.
 
 
+def upcoming_q(now):
+    """
+    Match events with an occurrence still to come: one-off events from
+    ``now`` on and every recurring series that hasn't ended.
+    """
+    return Q(date__gte=now) | (
+        ~Q(repeat="") & (
+            Q(repeat_until__isnull=True) |
+            Q(repeat_until__gte=timezone.localdate(now))
+        )
+    )
+
+
+class EventQuerySet(models.QuerySet):
+    def upcoming(self, now=None):
+        return self.filter(upcoming_q(now or timezone.now()))
+
+    def between(self, start=None, end=None):
+        """
+        Events taking place within ``[start, end)``: one-off events dated
+        in the range and recurring series running during it. Either bound
+        may be None.
+        """
+        one_off = Q(repeat="")
+        series = ~Q(repeat="")
+        if start is not None:
+            one_off &= Q(date__gte=start)
+            series &= (
+                Q(repeat_until__isnull=True) |
+                Q(repeat_until__gte=timezone.localdate(start))
+            )
+        if end is not None:
+            one_off &= Q(date__lt=end)
+            series &= Q(date__lt=end)
+        return self.filter(one_off | series)
+
+
 class Event(models.Model):
     """
     Store a single event created by host (user)
@@ -25,28 +93,312 @@ class Event(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     status = models.IntegerField(choices=STATUS, default=0)
     updated_on = models.DateTimeField(auto_now=True)
+    # Maximum number of attendees, blank for unlimited
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    # Denormalized count of booked seats, only changed by reserve_seat
+    # and release_seat so it can never exceed capacity
+    seats_taken = models.PositiveIntegerField(default=0)
+    # Denormalized number of bookings, moved with seats_taken
+    booking_count = models.PositiveIntegerField(default=0)
+    # Coordinates geocoded from location with the offline gazetteer
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    # Gazetteer town found in location, for the listing's town filter
+    town = models.CharField(
+        max_length=60, blank=True, default="", editable=False)
+    # Recurrence rule. ``date`` is the first occurrence; the others are
+    # expanded on demand and never stored.
+    repeat = models.CharField(
+        max_length=12, choices=REPEAT_CHOICES, blank=True, default="")
+    repeat_until = models.DateField(null=True, blank=True)
+
+    objects = EventQuerySet.as_manager()
+
+    @classmethod
+    def next_free_slug(cls, base_slug):
+        """
+        Return the next unused slug for ``base_slug`` with one query per
+        table.
+
+        Only the longest, highest ``base_slug-N`` match is fetched via the
+        slug index, so the cost doesn't grow with the number of events
+        sharing a title. Slugs of archived events count as used, so their
+        old links never lead to a new event.
+        """
+        pattern = rf"^{re.escape(base_slug)}(-[0-9]+)?$"
+        taken = [
+            slug for slug in (
+                model.objects.filter(
+                    slug__startswith=base_slug, slug__regex=pattern)
+                .order_by(Length("slug").desc(), "-slug")
+                .values_list("slug", flat=True)
+                .first()
+                for model in (cls, ArchivedEvent)
+            )
+            if slug is not None
+        ]
+        if not taken:
+            return base_slug
+        latest = max(taken, key=lambda slug: (len(slug), slug))
+        suffix = latest[len(base_slug) + 1:]
+        return f"{base_slug}-{int(suffix or 0) + 1}"
 
     def save(self, *args, **kwargs):
+        self.latitude, self.longitude = geocode(self.location) or (None, None)
+        self.town = place_name(self.location)
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+        if self.slug:
+            return super().save(*args, **kwargs)
+
         # Create slug from title if not already set (from admin)
         # as slug creation is not in host event form
-        if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            # Handle any duplicate titles by using counter
-            counter = 1
-            while Event.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        base_slug = slugify(self.title)
+        for attempt in range(SLUG_ATTEMPTS):
+            self.slug = self.next_free_slug(base_slug)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Another save took this slug in the meantime, try the
+                # next one. Re-raise anything that isn't a slug clash.
+                taken = Event.objects.filter(slug=self.slug).exists()
+                self.slug = ""
+                if not taken or attempt == SLUG_ATTEMPTS - 1:
+                    raise
+
+    @property
+    def is_recurring(self):
+        return bool(self.repeat)
+
+    def occurrences(self, start, end):
+        """
+        Yield the start times of occurrences within ``[start, end)``.
+
+        Expansion runs in local time so a weekly 7pm event stays at 7pm
+        across daylight saving changes.
+        """
+        return expand(
+            timezone.localtime(self.date), self.repeat, self.repeat_until,
+            start, end)
+
+    def next_occurrence(self, after=None):
+        """Start of the first occurrence from ``after`` (default now)."""
+        return next_occurrence(
+            timezone.localtime(self.date), self.repeat, self.repeat_until,
+            after or timezone.now())
+
+    def is_upcoming(self, now=None):
+        """In-memory counterpart of ``upcoming_q`` for a loaded event."""
+        now = now or timezone.now()
+        if self.date >= now:
+            return True
+        return self.is_recurring and (
+            self.repeat_until is None
+            or self.repeat_until >= timezone.localdate(now)
+        )
+
+    def has_occurrence(self, when):
+        """True if the series has an occurrence starting at ``when``."""
+        return next(self.occurrences(
+            when, when + timedelta(microseconds=1)), None) is not None
+
+    @property
+    def is_full(self):
+        return (
+            self.capacity is not None and self.seats_taken >= self.capacity
+        )
+
+    @property
+    def seats_left(self):
+        if self.capacity is None:
+            return None
+        return max(self.capacity - self.seats_taken, 0)
+
+    def occurrence_counter(self, occurrence):
+        """
+        Return the :model:`events.EventOccurrence` holding the counters of
+        one occurrence of a series, without creating it.
+        """
+        return (
+            self.occurrence_counters.filter(starts_at=occurrence).first()
+            or EventOccurrence(event=self, starts_at=occurrence)
+        )
+
+    def _counters(self, occurrence, seats):
+        """
+        Queryset for the single row holding the seat counters, limited to
+        rows with ``seats`` free. One-off events keep them on the event
+        row, occurrences of a series on a lazily created EventOccurrence
+        row.
+        """
+        if occurrence is None:
+            return Event.objects.filter(
+                Q(capacity__isnull=True) |
+                Q(seats_taken__lte=F("capacity") - seats),
+                pk=self.pk,
+            )
+        counter, created = EventOccurrence.objects.get_or_create(
+            event=self, starts_at=occurrence)
+        counters = EventOccurrence.objects.filter(pk=counter.pk)
+        if self.capacity is not None:
+            counters = counters.filter(
+                seats_taken__lte=self.capacity - seats)
+        return counters
+
+    def reserve_seat(self, occurrence=None, seats=1):
+        """
+        Take ``seats`` seats for a new booking with a single conditional
+        UPDATE.
+
+        The capacity check happens inside the UPDATE, so concurrent
+        bookings can never push seats_taken past capacity. The booking
+        count goes up by one in the same statement. Returns True if the
+        seats were taken.
+        """
+        reserved = self._counters(occurrence, seats).update(
+            seats_taken=F("seats_taken") + seats,
+            booking_count=F("booking_count") + 1,
+        )
+        if reserved and occurrence is None:
+            self.seats_taken += seats
+            self.booking_count += 1
+        return bool(reserved)
+
+    def release_seat(self, occurrence=None, seats=1):
+        """Give back the seats of a booking taken with reserve_seat."""
+        if occurrence is None:
+            counters = Event.objects.filter(pk=self.pk)
+            self.seats_taken = max(self.seats_taken - seats, 0)
+            self.booking_count = max(self.booking_count - 1, 0)
+        else:
+            counters = self.occurrence_counters.filter(starts_at=occurrence)
+        counters.update(
+            seats_taken=Greatest(F("seats_taken") - seats, 0),
+            booking_count=Greatest(F("booking_count") - 1, 0),
+        )
+
+    def book(self, user, occurrence=None, seats=1):
+        """
+        Book ``seats`` seats for ``user`` on the event, or the given
+        occurrence of a series.
+
+        The booking is inserted straight away and the unique constraint
+        rejects a duplicate, so there's no separate existence check and
+        a double submit can't book twice. A booking that gets no seat is
+        rolled back and the user joins the waitlist instead. Returns
+        BOOKED, ALREADY_BOOKED or WAITLISTED.
+        """
+        try:
+            with transaction.atomic():
+                Booking.objects.create(
+                    user=user, event=self, occurrence=occurrence,
+                    seats=seats)
+                if not self.reserve_seat(occurrence, seats):
+                    raise EventFull
+        except IntegrityError:
+            return ALREADY_BOOKED
+        except EventFull:
+            WaitlistEntry.objects.get_or_create(
+                user=user, event=self, occurrence=occurrence,
+                defaults={"seats": seats})
+            return WAITLISTED
+        return BOOKED
+
+    def promote_waitlist(self, occurrence=None):
+        """
+        Book seats for waitlisted users, first come first served, while
+        seats are available. A party that doesn't fit in the seats left
+        holds its place at the head of the queue. Call inside a
+        transaction.
+        """
+        promoted = []
+        while True:
+            entry = (
+                self.waitlist.select_for_update(skip_locked=True)
+                .filter(occurrence=occurrence)
+                .order_by("joined_at", "id")
+                .first()
+            )
+            if entry is None or not self.reserve_seat(
+                    occurrence, entry.seats):
+                break
+            promoted.append(Booking.objects.create(
+                user_id=entry.user_id, event=self, occurrence=occurrence,
+                seats=entry.seats))
+            entry.delete()
+        return promoted
 
     class Meta:
         ordering = ["-date"]
+        indexes = [
+            # Upcoming published events listing
+            models.Index(fields=["status", "date"]),
+            # Bounding box lookups for events near a place
+            models.Index(fields=["latitude", "longitude"]),
+            # Listing filtered by town, and its per-town option counts
+            models.Index(fields=["status", "town", "date"]),
+            # Recurring series for the date range filter; without it the
+            # series half of between() scans every published event
+            models.Index(
+                fields=["status", "date"],
+                condition=~Q(repeat=""),
+                name="event_series_date"),
+        ]
 
     def __str__(self):
         return f"{self.title} | hosted by {self.host}"
 
 
+def book_many(user, items):
+    """
+    Book ``user`` onto several events, or dates of a series, at once.
+
+    ``items`` is a list of ``(event, occurrence, seats)``. Everything runs
+    in one transaction: one query finds the user's existing bookings,
+    each item takes its seats with a conditional UPDATE and all new
+    bookings are written with a single bulk insert. Items that can't be
+    booked are reported rather than failing the batch, so the result is
+    ``[(event, occurrence, outcome)]`` with BOOKED, ALREADY_BOOKED or
+    FULL.
+    """
+    for attempt in range(BOOK_MANY_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _book_many(user, items)
+        except IntegrityError:
+            # A concurrent request booked one of the items first; the
+            # retry sees its booking and reports it as already booked
+            if attempt == BOOK_MANY_ATTEMPTS - 1:
+                raise
+
+
+def _book_many(user, items):
+    booked = set(
+        Booking.objects.filter(
+            user=user, event__in={event.pk for event, _, _ in items}
+        ).values_list("event_id", "occurrence")
+    )
+    results = []
+    bookings = []
+    for event, occurrence, seats in items:
+        if (event.pk, occurrence) in booked:
+            outcome = ALREADY_BOOKED
+        elif event.reserve_seat(occurrence, seats):
+            outcome = BOOKED
+            booked.add((event.pk, occurrence))
+            bookings.append(Booking(
+                user=user, event=event, occurrence=occurrence, seats=seats))
+        else:
+            outcome = FULL
+        results.append((event, occurrence, outcome))
+    Booking.objects.bulk_create(bookings)
+    return results
+
+
 class Booking(models.Model):
     """
     Store a event booking related to :model:`events.Event`
@@ -59,10 +411,303 @@ class Booking(models.Model):
                     Event,
                     on_delete=models.CASCADE,
                     related_name="event_bookings")
+    # Start of the booked occurrence for recurring events, else blank
+    occurrence = models.DateTimeField(null=True, blank=True)
+    seats = models.PositiveSmallIntegerField(default=1)
     booked_at = models.DateTimeField(auto_now_add=True)
+    # Set once the "your event is tomorrow" reminder has gone out
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["booked_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "user"],
+                condition=Q(occurrence__isnull=True),
+                name="unique_booking"),
+            models.UniqueConstraint(
+                fields=["event", "occurrence", "user"],
+                condition=Q(occurrence__isnull=False),
+                name="unique_occurrence_booking"),
+        ]
+        indexes = [
+            # Keyset pagination of an event's attendee roster
+            models.Index(fields=["event", "booked_at", "id"]),
+            # Bookings still owed a reminder, so run_reminders never
+            # scans the ones already reminded: one-off events by event,
+            # occurrences of a series by start time
+            models.Index(
+                fields=["event"],
+                condition=Q(
+                    occurrence__isnull=True, reminder_sent_at__isnull=True),
+                name="booking_unreminded_event"),
+            models.Index(
+                fields=["occurrence"],
+                condition=Q(
+                    occurrence__isnull=False,
+                    reminder_sent_at__isnull=True),
+                name="booking_unreminded_occurrence"),
+        ]
+
+    def __str__(self):
+        return f"{self.event} booked by {self.user}"
+
+
+class WaitlistEntry(models.Model):
+    """
+    A user waiting for a seat on a full :model:`events.Event`
+    """
+    user = models.ForeignKey(
+                    User,
+                    on_delete=models.CASCADE,
+                    related_name="event_waitlists")
+    event = models.ForeignKey(
+                    Event,
+                    on_delete=models.CASCADE,
+                    related_name="waitlist")
+    occurrence = models.DateTimeField(null=True, blank=True)
+    # Spaces the user asked for, all booked together when promoted
+    seats = models.PositiveSmallIntegerField(default=1)
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["joined_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "user"],
+                condition=Q(occurrence__isnull=True),
+                name="unique_waitlist_entry"),
+            models.UniqueConstraint(
+                fields=["event", "occurrence", "user"],
+                condition=Q(occurrence__isnull=False),
+                name="unique_occurrence_waitlist_entry"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} waiting for {self.event}"
+
+
+class EventOccurrence(models.Model):
+    """
+    Seat counters for one occurrence of a recurring :model:`events.Event`.
+
+    Rows are only created when an occurrence is first booked, so storage
+    grows with booked occurrences rather than with the whole series.
+    """
+    event = models.ForeignKey(
+                    Event,
+                    on_delete=models.CASCADE,
+                    related_name="occurrence_counters")
+    starts_at = models.DateTimeField()
+    seats_taken = models.PositiveIntegerField(default=0)
+    booking_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["starts_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "starts_at"], name="unique_occurrence"),
+        ]
+
+    def __str__(self):
+        return f"{self.event} on {self.starts_at}"
+
+    @property
+    def is_full(self):
+        capacity = self.event.capacity
+        return capacity is not None and self.seats_taken >= capacity
+
+    @property
+    def seats_left(self):
+        if self.event.capacity is None:
+            return None
+        return max(self.event.capacity - self.seats_taken, 0)
+
+
+class EventRecommendation(models.Model):
+    """
+    A precomputed "people who booked this also booked" neighbour of an
+    :model:`events.Event`, written by the compute_recommendations command.
+    """
+    event = models.ForeignKey(
+                    Event,
+                    on_delete=models.CASCADE,
+                    related_name="recommendations")
+    recommended = models.ForeignKey(
+                    Event,
+                    on_delete=models.CASCADE,
+                    related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ["event", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "rank"], name="unique_recommendation_rank"),
+        ]
+
+    def __str__(self):
+        return f"{self.event} -> {self.recommended} ({self.score:.2f})"
+
+
+DIGEST_SECTIONS = (
+    ("events", "What's on"),
+    ("listings", "New in the marketplace"),
+    ("posts", "Top posts"),
+)
+
+
+class DigestSection(models.Model):
+    """
+    One section of the weekly "what's on" digest, stored as a ready to
+    serve snapshot. Content changes only mark the section stale; the
+    build_digest command rebuilds stale sections.
+    """
+    # Monday of the digest's week, in local time
+    week_start = models.DateField()
+    section = models.CharField(max_length=12, choices=DIGEST_SECTIONS)
+    items = models.JSONField(default=list)
+    stale = models.BooleanField(default=True)
+    built_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["week_start", "section"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["week_start", "section"],
+                name="unique_digest_section"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_section_display()} ({self.week_start})"
+
+
+class ScheduledJob(models.Model):
+    """
+    Schedule and progress of a periodic background job.
+
+    Workers run from cron claim a job with a conditional UPDATE on
+    ``next_run_at``, so overlapping workers never run it twice.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    interval = models.DurationField(default=timedelta(minutes=1))
+    next_run_at = models.DateTimeField(default=timezone.now)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_processed = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def claim(cls, name, now=None, force=False, interval=None):
+        """
+        Return the job called ``name`` if it is due and this caller won
+        it, pushing its next run one interval ahead. Returns None if the
+        job isn't due or another worker claimed it first. ``interval``
+        only applies when the job is first created.
+        """
+        now = now or timezone.now()
+        defaults = {"next_run_at": now}
+        if interval is not None:
+            defaults["interval"] = interval
+        job, created = cls.objects.get_or_create(
+            name=name, defaults=defaults)
+        due = cls.objects.filter(pk=job.pk)
+        if not force:
+            due = due.filter(next_run_at__lte=now)
+        if not due.update(
+                next_run_at=now + F("interval"), last_run_at=now):
+            return None
+        job.refresh_from_db()
+        return job
+
+    def finish(self, processed):
+        """Record how many items the run processed."""
+        self.last_processed = processed
+        ScheduledJob.objects.filter(pk=self.pk).update(
+            last_processed=processed)
+
+
+class ArchivedEvent(models.Model):
+    """
+    A past :model:`events.Event` moved out of the events table by the
+    archive_events command, keeping its original id. Read only.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=100)
+    slug = models.CharField(max_length=200, db_index=True)
+    date = models.DateTimeField()
+    location = models.CharField(max_length=150)
+    host = models.ForeignKey(
+                    User,
+                    on_delete=models.CASCADE,
+                    related_name="archived_events")
+    description = models.TextField(blank=True)
+    featured_image = CloudinaryField('image', default='placeholder')
+    created_on = models.DateTimeField()
+    updated_on = models.DateTimeField()
+    status = models.IntegerField(choices=STATUS, default=0)
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    booking_count = models.PositiveIntegerField(default=0)
+    repeat = models.CharField(
+        max_length=12, choices=REPEAT_CHOICES, blank=True, default="")
+    repeat_until = models.DateField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Fields copied across from the live event
+    COPIED_FIELDS = (
+        "id", "title", "slug", "date", "location", "host_id", "description",
+        "featured_image", "created_on", "updated_on", "status", "capacity",
+        "booking_count", "repeat", "repeat_until",
+    )
+
+    class Meta:
+        ordering = ["-date"]
+        indexes = [
+            models.Index(fields=["host", "date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.title} | hosted by {self.host} (archived)"
+
+    @classmethod
+    def from_event(cls, event):
+        return cls(**{
+            field: getattr(event, field) for field in cls.COPIED_FIELDS})
+
+
+class ArchivedBooking(models.Model):
+    """
+    A :model:`events.Booking` of an :model:`events.ArchivedEvent`.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+                    User,
+                    on_delete=models.CASCADE,
+                    related_name="archived_bookings")
+    event = models.ForeignKey(
+                    ArchivedEvent,
+                    on_delete=models.CASCADE,
+                    related_name="bookings")
+    occurrence = models.DateTimeField(null=True, blank=True)
+    seats = models.PositiveSmallIntegerField(default=1)
+    booked_at = models.DateTimeField()
+
+    COPIED_FIELDS = (
+        "id", "user_id", "event_id", "occurrence", "seats", "booked_at",
+    )
 
     class Meta:
         ordering = ["booked_at"]
+        indexes = [
+            models.Index(fields=["user", "booked_at"]),
+        ]
 
     def __str__(self):
         return f"{self.event} booked by {self.user}"
+
+    @classmethod
+    def from_booking(cls, booking):
+        return cls(**{
+            field: getattr(booking, field) for field in cls.COPIED_FIELDS})
@@ -0,0 +1,62 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations
+
+# Neighbours kept per event
+TOP_K = 4
+
+# Users with more bookings than this are skipped when counting pairs:
+# their bookings say little about taste and cost quadratically
+MAX_BOOKINGS_PER_USER = 200
+
+
+def co_booking_counts(pairs):
+    """
+    Count how often each two events were booked by the same person.
+
+    ``pairs`` is an iterable of ``(user_id, event_id)`` ordered by user,
+    so only one user's bookings are held at a time. Returns the sparse
+    pair counts keyed by ``(low_id, high_id)`` and the number of people
+    who booked each event.
+    """
+    counts = Counter()
+    bookers = Counter()
+
+    def flush(events):
+        bookers.update(events)
+        if len(events) <= MAX_BOOKINGS_PER_USER:
+            counts.update(combinations(sorted(events), 2))
+
+    current_user, events = None, set()
+    for user_id, event_id in pairs:
+        if user_id != current_user:
+            flush(events)
+            current_user, events = user_id, set()
+        events.add(event_id)
+    flush(events)
+    return counts, bookers
+
+
+def top_neighbours(counts, bookers, candidates=None, k=TOP_K):
+    """
+    Return ``{event_id: [(neighbour_id, score), ...]}``, best first.
+
+    Scores are the cosine similarity of the two events' sets of bookers,
+    so a popular event doesn't top every list just by being popular.
+    Neighbours outside ``candidates`` (when given) are left out.
+    """
+    neighbours = defaultdict(list)
+    for (a, b), together in counts.items():
+        score = together / math.sqrt(bookers[a] * bookers[b])
+        if candidates is None or b in candidates:
+            neighbours[a].append((score, together, b))
+        if candidates is None or a in candidates:
+            neighbours[b].append((score, together, a))
+    return {
+        event_id: [
+            (neighbour, score)
+            for score, _, neighbour in heapq.nlargest(k, scored)
+        ]
+        for event_id, scored in neighbours.items()
+    }
@@ -0,0 +1,91 @@
+import calendar
+from datetime import timedelta
+
+REPEAT_CHOICES = (
+    ("", "Does not repeat"),
+    ("weekly", "Every week"),
+    ("fortnightly", "Every two weeks"),
+    ("monthly", "Every month"),
+)
+
+# Occurrences are named in URLs and forms by their local start time
+OCCURRENCE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+_STEPS = {
+    "weekly": timedelta(weeks=1),
+    "fortnightly": timedelta(weeks=2),
+}
+
+
+def add_months(value, months):
+    """Shift a datetime by whole months, clamping to the month's end."""
+    month_index = value.month - 1 + months
+    year = value.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def expand(first, repeat, until, start, end):
+    """
+    Yield occurrence datetimes of a series within ``[start, end)``.
+
+    ``first`` is the first occurrence and ``until`` an optional last date.
+    The first occurrence in the window is found arithmetically rather than
+    by stepping from ``first``, so the cost only depends on how many
+    occurrences fall inside the window.
+    """
+    if not repeat:
+        if start <= first < end:
+            yield first
+        return
+
+    if repeat == "monthly":
+        months = 0
+        if start > first:
+            months = (
+                (start.year - first.year) * 12 + start.month - first.month
+            )
+            months = max(months - 1, 0)
+        occurrence = add_months(first, months)
+        while occurrence < end:
+            if until and occurrence.date() > until:
+                return
+            if occurrence >= start:
+                yield occurrence
+            months += 1
+            occurrence = add_months(first, months)
+        return
+
+    step = _STEPS[repeat]
+    skipped = max((start - first) // step, 0) if start > first else 0
+    occurrence = first + skipped * step
+    while occurrence < end:
+        if until and occurrence.date() > until:
+            return
+        if occurrence >= start:
+            yield occurrence
+        occurrence += step
+
+
+def next_occurrence(first, repeat, until, after):
+    """Return the first occurrence at or after ``after``, or None."""
+    # A month comfortably holds the next occurrence of every rule
+    return next(
+        expand(first, repeat, until, after, after + timedelta(days=62)),
+        None,
+    )
+
+
+def rrule(repeat, until):
+    """Return the iCalendar RRULE value for a series, or None."""
+    if not repeat:
+        return None
+    rule = {
+        "weekly": "FREQ=WEEKLY",
+        "fortnightly": "FREQ=WEEKLY;INTERVAL=2",
+        "monthly": "FREQ=MONTHLY",
+    }[repeat]
+    if until:
+        rule += f";UNTIL={until:%Y%m%d}T235959Z"
+    return rule
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .caching import bump_listing_version, invalidate_event_page
+from .digest import mark_stale
+from .models import Event
+
+
+@receiver(post_save, sender=Event)
+def invalidate_listings_on_save(sender, instance, **kwargs):
+    bump_listing_version()
+    invalidate_event_page(instance.slug)
+    mark_stale("events")
+
+
+@receiver(post_delete, sender=Event)
+def invalidate_listings_on_delete(sender, instance, **kwargs):
+    bump_listing_version()
+    invalidate_event_page(instance.slug)
+    mark_stale("events")
@@ -1,10 +1,34 @@
-from django.test import TestCase, Client
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, Client
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta
-from .models import Event, Booking
+from datetime import datetime, timedelta
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from decimal import Decimal
+from feed.models import Comment, Post
+from marketplace.models import Bid, Listing, Notification
+from .models import (
+    ALREADY_BOOKED, BOOKED, WAITLISTED, ArchivedBooking, ArchivedEvent,
+    DigestSection, Event, Booking, EventOccurrence, EventRecommendation,
+    ScheduledJob, WaitlistEntry
+)
+from .digest import digest_week, rebuild
 from .forms import HostEventForm
+from .geocoding import geocode
+from .images import MAX_IMAGE_DIMENSION, optimise_image
+from .ical import feed_token
+from .recommendations import co_booking_counts, top_neighbours
 
 
 # ===== MODEL TESTS =====
@@ -62,6 +86,63 @@ class EventModelTest(TestCase):
         self.assertEqual(event1.slug, 'same-title')
         self.assertEqual(event2.slug, 'same-title-1')
 
+    def test_event_slug_continues_after_highest_suffix(self):
+        """Test that the next slug follows the highest existing suffix"""
+        for title in ('Clean-up', 'Clean-up', 'Clean-up'):
+            Event.objects.create(
+                title=title, date=self.future_date,
+                location='Location', host=self.user)
+        Event.objects.filter(slug='clean-up-1').delete()
+        event = Event.objects.create(
+            title='Clean-up', date=self.future_date,
+            location='Location', host=self.user)
+        self.assertEqual(event.slug, 'clean-up-3')
+
+    def test_event_slug_ignores_longer_titles(self):
+        """Test that slugs sharing a prefix aren't counted as duplicates"""
+        Event.objects.create(
+            title='Market Day', date=self.future_date,
+            location='Location', host=self.user)
+        event = Event.objects.create(
+            title='Market', date=self.future_date,
+            location='Location', host=self.user)
+        self.assertEqual(event.slug, 'market')
+
+    def test_event_slug_query_count_constant(self):
+        """Test that creation cost doesn't grow with duplicates"""
+        def create():
+            with CaptureQueriesContext(connection) as queries:
+                Event.objects.create(
+                    title='Community Clean-up', date=self.future_date,
+                    location='Location', host=self.user)
+            return len(queries)
+
+        second = [create(), create()][1]
+        for i in range(8):
+            create()
+        self.assertEqual(create(), second)
+
+    def test_event_slug_retries_after_race(self):
+        """Test that a slug taken concurrently is retried"""
+        Event.objects.create(
+            title='Race', date=self.future_date,
+            location='Location', host=self.user)
+        real = Event.next_free_slug.__func__
+        calls = []
+
+        def stale_then_real(cls, base_slug):
+            calls.append(base_slug)
+            # First call behaves as if the existing row wasn't seen yet
+            return base_slug if len(calls) == 1 else real(cls, base_slug)
+
+        with mock.patch.object(
+                Event, 'next_free_slug', classmethod(stale_then_real)):
+            event = Event.objects.create(
+                title='Race', date=self.future_date,
+                location='Location', host=self.user)
+        self.assertEqual(event.slug, 'race-1')
+        self.assertEqual(len(calls), 2)
+
     def test_event_string_representation(self):
         """Test __str__ method"""
         event = Event.objects.create(
@@ -226,6 +307,305 @@ class EventsListViewTest(TestCase):
         self.assertEqual(len(response.context['object_list']), 6)
 
 
+class EventsListCacheTest(TestCase):
+    """Test caching of the upcoming events listing"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass123')
+        self.event = Event.objects.create(
+            title='Cached Event',
+            date=timezone.now() + timedelta(hours=1),
+            location='Location',
+            host=self.user,
+            status=1
+        )
+
+    def test_repeat_request_served_from_cache(self):
+        """Test that a cached page needs no queries"""
+        # Both requests in the same one-minute cache bucket
+        with mock.patch(
+                'django.utils.timezone.now', return_value=timezone.now()):
+            self.client.get(reverse('events:events_feed'))
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('events:events_feed'))
+        self.assertContains(response, 'Cached Event')
+
+    def test_cache_invalidated_on_event_change(self):
+        """Test that creating, editing and deleting refresh the page"""
+        self.client.get(reverse('events:events_feed'))
+        other = Event.objects.create(
+            title='Another Event',
+            date=timezone.now() + timedelta(days=1),
+            location='Location',
+            host=self.user,
+            status=1
+        )
+        response = self.client.get(reverse('events:events_feed'))
+        self.assertContains(response, 'Another Event')
+
+        other.title = 'Renamed Event'
+        other.save()
+        response = self.client.get(reverse('events:events_feed'))
+        self.assertContains(response, 'Renamed Event')
+
+        other.delete()
+        response = self.client.get(reverse('events:events_feed'))
+        self.assertNotContains(response, 'Renamed Event')
+
+    def test_started_events_drop_off_next_minute(self):
+        """Test that the date filter uses the time of each request"""
+        self.client.get(reverse('events:events_feed'))
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            response = self.client.get(reverse('events:events_feed'))
+        self.assertNotContains(response, 'Cached Event')
+
+
+class EventsListFilterTest(TestCase):
+    """Test the date, keyword and town filters on the events listing"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass123')
+        soon = timezone.now() + timedelta(days=2)
+        later = timezone.now() + timedelta(days=20)
+        self.create('Quiz Night', soon, 'The Swan, Leeds', 'Pub quiz')
+        self.create('Book Club', soon, 'Library, York', 'Bring a quiz book')
+        self.create('Park Run', later, 'Roundhay Park, Leeds', '5k run')
+
+    def create(self, title, date, location, description):
+        return Event.objects.create(
+            title=title, date=date, location=location,
+            description=description, host=self.user, status=1)
+
+    def titles(self, **params):
+        response = self.client.get(reverse('events:events_feed'), params)
+        return sorted(event.title for event in response.context['event_list'])
+
+    def test_town_is_derived_from_location(self):
+        """Test that saving an event records the gazetteer town"""
+        self.assertEqual(
+            Event.objects.get(title='Quiz Night').town, 'Leeds')
+
+    def test_keyword_filter(self):
+        """Test that keywords match titles and descriptions"""
+        self.assertEqual(self.titles(q='quiz'), ['Book Club', 'Quiz Night'])
+
+    def test_town_filter(self):
+        """Test that the town filter keeps only that town's events"""
+        self.assertEqual(self.titles(town='Leeds'), ['Park Run', 'Quiz Night'])
+
+    def test_date_range_filter(self):
+        """Test that the date range includes both end days"""
+        end = timezone.localdate() + timedelta(days=2)
+        self.assertEqual(
+            self.titles(to=end.isoformat()), ['Book Club', 'Quiz Night'])
+        start = timezone.localdate() + timedelta(days=10)
+        self.assertEqual(self.titles(**{'from': start.isoformat()}),
+                         ['Park Run'])
+
+    def test_invalid_date_ignored(self):
+        """Test that a malformed date doesn't filter or error"""
+        self.assertEqual(len(self.titles(to='2030-13-45')), 3)
+
+    def test_last_representable_date(self):
+        """Test that the widest valid range keeps every event"""
+        self.assertEqual(
+            len(self.titles(**{'from': '0001-01-01', 'to': '9999-12-31'})),
+            3)
+
+    def test_filters_combine(self):
+        """Test that filters narrow each other"""
+        self.assertEqual(self.titles(q='quiz', town='Leeds'), ['Quiz Night'])
+
+    def test_town_option_counts_cached(self):
+        """Test that town counts are computed once per cache period"""
+        response = self.client.get(reverse('events:events_feed'))
+        self.assertEqual(
+            response.context['town_options'], [('Leeds', 2), ('York', 1)])
+        self.assertContains(response, 'Leeds (2)')
+        # Listing page and town counts both come from the cache
+        with self.assertNumQueries(0):
+            self.client.get(reverse('events:events_feed'))
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite plan format')
+    def test_filters_use_indexes(self):
+        """Test that no filter makes the listing scan the events table"""
+        start = timezone.localdate() + timedelta(days=10)
+        end = start + timedelta(days=7)
+        for params in ({}, {'town': 'Leeds'}, {'q': 'quiz', 'town': 'York'},
+                       {'from': start.isoformat(), 'to': end.isoformat()}):
+            with self.subTest(**params):
+                response = self.client.get(
+                    reverse('events:events_feed'), params)
+                plan = response.context['view'].get_queryset().explain()
+                self.assertIn('USING INDEX', plan)
+                self.assertNotIn('SCAN events_event', plan)
+
+
+class GeocodingTest(TestCase):
+    """Test offline geocoding and proximity search"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass123')
+
+    def create(self, title, location):
+        return Event.objects.create(
+            title=title,
+            date=timezone.now() + timedelta(days=7),
+            location=location,
+            host=self.user,
+            status=1
+        )
+
+    def test_geocode_uses_last_place_in_address(self):
+        """Test that the town at the end of an address wins"""
+        self.assertEqual(geocode('12 Bath Street, Leeds'), geocode('Leeds'))
+
+    def test_geocode_prefers_longest_name(self):
+        """Test that multi-word places beat shorter prefixes"""
+        self.assertEqual(
+            geocode('Quayside, Newcastle upon Tyne'),
+            (54.9783, -1.6178))
+
+    def test_geocode_unknown_location(self):
+        """Test that unknown places aren't geocoded"""
+        self.assertIsNone(geocode('The village hall'))
+        event = self.create('Hall Event', 'The village hall')
+        self.assertIsNone(event.latitude)
+
+    def test_event_geocoded_on_save(self):
+        """Test that coordinates follow location edits"""
+        event = self.create('Moving Event', 'Town Hall, York')
+        self.assertAlmostEqual(event.latitude, 53.96)
+        event.location = 'Old Market, Bristol'
+        event.save()
+        event.refresh_from_db()
+        self.assertAlmostEqual(event.latitude, 51.4545)
+
+    def test_events_near_place(self):
+        """Test that the listing filters events by distance"""
+        self.create('Leeds Event', 'Millennium Square, Leeds')
+        self.create('Bradford Event', 'City Park, Bradford')
+        self.create('London Event', 'Hyde Park, London')
+        self.create('Somewhere Event', 'Somewhere')
+
+        response = self.client.get(
+            reverse('events:events_feed'), {'near': 'leeds', 'radius': 25})
+        self.assertContains(response, 'Leeds Event')
+        self.assertContains(response, 'Bradford Event')
+        self.assertContains(response, 'km away')
+        self.assertNotContains(response, 'London Event')
+        self.assertNotContains(response, 'Somewhere Event')
+
+        response = self.client.get(
+            reverse('events:events_feed'), {'near': 'leeds', 'radius': 5})
+        self.assertNotContains(response, 'Bradford Event')
+
+    def test_unknown_place_shows_all_events(self):
+        """Test that an unknown place doesn't filter the listing"""
+        self.create('Leeds Event', 'Leeds')
+        response = self.client.get(
+            reverse('events:events_feed'), {'near': 'Atlantis'})
+        self.assertContains(response, 'Leeds Event')
+        self.assertContains(response, "couldn't find")
+
+    def test_pagination_keeps_filter(self):
+        """Test that page links carry the proximity filter"""
+        for i in range(7):
+            self.create(f'Event {i}', 'Leeds')
+        response = self.client.get(
+            reverse('events:events_feed'), {'near': 'Leeds'})
+        self.assertContains(response, '?near=Leeds&amp;radius=10&amp;page=2')
+
+
+class EventCalendarViewTest(TestCase):
+    """Test the month calendar view"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass123')
+        self.url = reverse('events:event_calendar', args=[2030, 5])
+
+    def create(self, title, day, hour=12, status=1):
+        return Event.objects.create(
+            title=title,
+            date=timezone.make_aware(datetime(2030, 5, day, hour)),
+            location='Location',
+            host=self.user,
+            status=status
+        )
+
+    def test_calendar_shows_day_titles_and_overflow(self):
+        """Test that busy days show the first titles and a count"""
+        for hour in range(9, 14):
+            self.create(f'Busy {hour}', 10, hour)
+        self.create('Quiet Event', 20)
+        self.create('Draft Event', 20, status=0)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'May 2030')
+        self.assertContains(response, 'Busy 9')
+        self.assertContains(response, 'Busy 11')
+        self.assertNotContains(response, 'Busy 12')
+        self.assertContains(response, '+2 more')
+        self.assertContains(response, 'Quiet Event')
+        self.assertNotContains(response, 'Draft Event')
+
+    def test_calendar_uses_two_queries_then_cache(self):
+        """Test that the month costs two queries, then none"""
+        for day in range(1, 29):
+            self.create(f'Event {day}', day)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_calendar_cache_invalidated_on_change(self):
+        """Test that new events appear in a cached month"""
+        self.client.get(self.url)
+        self.create('New Event', 15)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'New Event')
+
+    def test_calendar_expands_recurring_events(self):
+        """Test that a weekly series shows on every week of the month"""
+        series = self.create('Weekly Run', 1, 9)
+        series.repeat = 'weekly'
+        series.repeat_until = datetime(2030, 5, 22).date()
+        series.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Weekly Run', count=4)
+        self.assertContains(response, '?occurrence=2030-05-15T09%3A00%3A00')
+
+    def test_invalid_month_404(self):
+        """Test that an impossible month is a 404"""
+        response = self.client.get(
+            reverse('events:event_calendar', args=[2030, 13]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_first_and_last_months(self):
+        """Test that the ends of the range render without outward links"""
+        first = self.client.get(reverse('events:event_calendar', args=[1, 1]))
+        self.assertEqual(first.status_code, 200)
+        self.assertIsNone(first.context['previous_month'])
+        self.assertContains(first, '/calendar/1/2/')
+        last = self.client.get(
+            reverse('events:event_calendar', args=[9998, 12]))
+        self.assertEqual(last.status_code, 200)
+        self.assertIsNone(last.context['next_month'])
+        self.assertContains(last, '/calendar/9998/11/')
+
+
 class EventDetailViewTest(TestCase):
     """Test the event detail view"""
 
@@ -268,6 +648,287 @@ class EventDetailViewTest(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+class WeeklyDigestTest(TestCase):
+    """Test the weekly digest snapshot and its page"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='host', password='testpass123')
+        monday = digest_week()
+        self.event = Event.objects.create(
+            title='Monday Meetup',
+            date=timezone.make_aware(
+                datetime.combine(monday, datetime.min.time())
+            ) + timedelta(hours=12),
+            location='Location',
+            host=self.user,
+            status=1
+        )
+        Event.objects.create(
+            title='Next Week Meetup',
+            date=self.event.date + timedelta(days=7),
+            location='Location',
+            host=self.user,
+            status=1
+        )
+        self.listing = Listing.objects.create(
+            seller=self.user, title='Old Bike',
+            starting_price=Decimal('10.00'))
+        self.post = Post.objects.create(
+            title='Busy Post', content='Content', author=self.user,
+            accepted=True)
+        Comment.objects.create(
+            post=self.post, author=self.user, content='Hi', accepted=True)
+
+    def build(self):
+        out = StringIO()
+        call_command('build_digest', '--force', stdout=out)
+        return out.getvalue()
+
+    def items(self, section):
+        return DigestSection.objects.get(
+            week_start=digest_week(), section=section).items
+
+    def test_build_stores_sections(self):
+        """Test that every section is built from this week's content"""
+        self.assertIn('Rebuilt 3 digest sections', self.build())
+        self.assertEqual(
+            [item['title'] for item in self.items('events')],
+            ['Monday Meetup'])
+        self.assertEqual(self.items('listings')[0]['title'], 'Old Bike')
+        self.assertEqual(self.items('posts')[0]['comments'], 1)
+
+    def test_only_stale_sections_rebuilt(self):
+        """Test that a change rebuilds just the section it affects"""
+        self.build()
+        self.assertIn('Rebuilt 0 digest sections', self.build())
+        self.event.title = 'Renamed Meetup'
+        self.event.save()
+        self.assertIn('Rebuilt 1 digest sections', self.build())
+        self.assertEqual(self.items('events')[0]['title'], 'Renamed Meetup')
+
+    def test_bids_leave_listings_fresh(self):
+        """Test that a bid doesn't mark the listings stale but a sale does"""
+        self.build()
+        bidder = User.objects.create_user(username='bidder', password='x')
+        self.listing.record_bid(Bid.objects.create(
+            listing=self.listing, bidder=bidder, amount=Decimal('12.00')))
+        self.assertIn('Rebuilt 0 digest sections', self.build())
+        self.listing.is_sold = True
+        self.listing.save(update_fields=['is_sold', 'updated_at'])
+        self.assertIn('Rebuilt 1 digest sections', self.build())
+        self.assertEqual(self.items('listings'), [])
+
+    def test_page_served_from_cache(self):
+        """Test that a repeat visit doesn't touch the database"""
+        self.build()
+        url = reverse('events:weekly_digest')
+        self.assertContains(self.client.get(url), 'Monday Meetup')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Busy Post')
+
+    def test_unbuilt_week_not_cached(self):
+        """Test that a visit before the first build isn't cached"""
+        url = reverse('events:weekly_digest')
+        self.assertNotContains(self.client.get(url), 'Monday Meetup')
+        rebuild(digest_week())
+        self.assertContains(self.client.get(url), 'Monday Meetup')
+
+    def test_rebuild_refreshes_page(self):
+        """Test that a rebuilt section shows up straight away"""
+        self.build()
+        url = reverse('events:weekly_digest')
+        self.client.get(url)
+        self.event.title = 'Renamed Meetup'
+        self.event.save()
+        self.build()
+        self.assertContains(self.client.get(url), 'Renamed Meetup')
+
+    def test_json_feed(self):
+        """Test that the digest is available as JSON"""
+        self.build()
+        data = self.client.get(reverse('events:weekly_digest_json')).json()
+        self.assertEqual(data['week_start'], digest_week().isoformat())
+        self.assertEqual(
+            [section['name'] for section in data['sections']],
+            ['events', 'listings', 'posts'])
+
+
+class EventDetailPageCacheTest(TestCase):
+    """Test the cached event page served to anonymous visitors"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.host = User.objects.create_user(
+            username='host', password='testpass123')
+        self.event = Event.objects.create(
+            title='Cached Event',
+            date=timezone.now() + timedelta(days=7),
+            location='Location',
+            host=self.host,
+            status=1
+        )
+        self.url = reverse('events:event_detail', args=[self.event.slug])
+
+    def test_anonymous_hit_costs_no_queries(self):
+        """Test that a repeat anonymous visit is served from the cache"""
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+        self.assertIn('Last-Modified', second)
+
+    def test_anonymous_page_has_no_personal_parts(self):
+        """Test that the cached page carries no forms or tokens"""
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'editEventFormModal')
+        self.assertFalse(response.context['is_host'])
+
+    def test_saving_event_refreshes_page(self):
+        """Test that an edit is visible straight away"""
+        self.client.get(self.url)
+        self.event.title = 'Renamed Event'
+        self.event.save()
+        self.assertContains(self.client.get(self.url), 'Renamed Event')
+
+    def test_logged_in_users_bypass_cache(self):
+        """Test that signed-in visitors get their own rendering"""
+        self.client.get(self.url)
+        self.client.force_login(self.host)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'editEventFormModal')
+
+    def test_host_page_loads_edit_form_on_demand(self):
+        """Test that the host's page links the edit form, not renders it"""
+        self.client.force_login(self.host)
+        response = self.client.get(self.url)
+        self.assertContains(
+            response,
+            reverse('events:edit_event_form', args=[self.event.slug]))
+        self.assertNotContains(response, 'id="id_title"')
+
+    def test_edit_form_fragment(self):
+        """Test that the fragment holds the host's filled-in form"""
+        url = reverse('events:edit_event_form', args=[self.event.slug])
+        self.client.force_login(self.host)
+        response = self.client.get(url)
+        self.assertContains(response, 'id="id_title"')
+        self.assertContains(response, 'value="Cached Event"')
+
+    def test_edit_form_fragment_host_only(self):
+        """Test that other users can't fetch the edit form"""
+        other = User.objects.create_user(
+            username='other', password='testpass123')
+        self.client.force_login(other)
+        response = self.client.get(
+            reverse('events:edit_event_form', args=[self.event.slug]))
+        self.assertEqual(response.status_code, 404)
+
+
+class RecommendationsTest(TestCase):
+    """Test the co-booking recommendations"""
+
+    def setUp(self):
+        cache.clear()
+        self.host = User.objects.create_user(
+            username='host', password='testpass123')
+        self.users = [
+            User.objects.create_user(
+                username=f'user{number}', password='testpass123')
+            for number in range(3)
+        ]
+        date = timezone.now() + timedelta(days=7)
+        self.events = [
+            Event.objects.create(
+                title=f'Event {number}', date=date, location='Location',
+                host=self.host, status=1)
+            for number in range(4)
+        ]
+
+    def book(self, user, *events):
+        for event in events:
+            Booking.objects.create(user=user, event=event)
+
+    def run_command(self):
+        call_command(
+            'compute_recommendations', '--force', stdout=StringIO())
+
+    def test_counts_pairs_per_user(self):
+        """Test that co-bookings are counted once per person"""
+        counts, bookers = co_booking_counts(
+            [(1, 10), (1, 20), (1, 30), (2, 10), (2, 20)])
+        self.assertEqual(counts[(10, 20)], 2)
+        self.assertEqual(counts[(10, 30)], 1)
+        self.assertNotIn((20, 10), counts)
+        self.assertEqual(bookers[10], 2)
+
+    def test_neighbours_ranked_by_similarity(self):
+        """Test that the closest neighbours come first"""
+        counts, bookers = co_booking_counts(
+            [(1, 10), (1, 20), (2, 10), (2, 20), (3, 10), (3, 30)])
+        neighbours = top_neighbours(counts, bookers, k=1)
+        self.assertEqual([n for n, _ in neighbours[10]], [20])
+        neighbours = top_neighbours(counts, bookers, candidates={30})
+        self.assertEqual([n for n, _ in neighbours[10]], [30])
+
+    def test_command_stores_top_neighbours(self):
+        """Test that the command stores ranked recommendations"""
+        first, second, third, _ = self.events
+        self.book(self.users[0], first, second, third)
+        self.book(self.users[1], first, second)
+        self.run_command()
+        ranked = list(
+            EventRecommendation.objects.filter(event=first)
+            .values_list('recommended', flat=True))
+        self.assertEqual(ranked, [second.pk, third.pk])
+
+    def test_rerun_replaces_recommendations(self):
+        """Test that a rerun drops stale neighbours"""
+        first, second, third, _ = self.events
+        self.book(self.users[0], first, second)
+        self.run_command()
+        Booking.objects.filter(event=second).delete()
+        self.book(self.users[0], third)
+        self.run_command()
+        self.assertEqual(
+            list(EventRecommendation.objects.filter(event=first)
+                 .values_list('recommended', flat=True)),
+            [third.pk])
+
+    def test_past_events_not_recommended(self):
+        """Test that only upcoming events are recommended"""
+        first, second, _, _ = self.events
+        Event.objects.filter(pk=second.pk).update(
+            date=timezone.now() - timedelta(days=1))
+        self.book(self.users[0], first, second)
+        self.run_command()
+        self.assertFalse(
+            EventRecommendation.objects.filter(event=first).exists())
+        self.assertTrue(
+            EventRecommendation.objects.filter(event=second).exists())
+
+    def test_detail_page_shows_recommendations(self):
+        """Test that the event page lists neighbours with one query"""
+        first, second, _, _ = self.events
+        self.book(self.users[0], first, second)
+        self.run_command()
+        url = reverse('events:event_detail', args=[first.slug])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'People who booked this also booked')
+        self.assertEqual(
+            list(response.context['recommendations']), [second])
+        recommendation_queries = [
+            query for query in queries.captured_queries
+            if 'eventrecommendation' in query['sql']
+        ]
+        self.assertEqual(len(recommendation_queries), 1)
+
+
 class BookEventViewTest(TestCase):
     """Test the book event functionality"""
 
@@ -316,6 +977,467 @@ class BookEventViewTest(TestCase):
         # Should still only have 1 booking
         self.assertEqual(Booking.objects.count(), 1)
 
+    def test_duplicate_booking_keeps_counters(self):
+        """Test that a repeat submission reports and changes nothing"""
+        self.assertEqual(self.event.book(self.attendee), BOOKED)
+        self.assertEqual(self.event.book(self.attendee), ALREADY_BOOKED)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.booking_count, 1)
+        self.assertEqual(self.event.seats_taken, 1)
+
+    def test_booked_user_not_waitlisted_when_full(self):
+        """Test that rebooking a full event doesn't join the waitlist"""
+        self.event.capacity = 1
+        self.event.save()
+        self.event.book(self.attendee)
+        self.assertEqual(self.event.book(self.attendee), ALREADY_BOOKED)
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_booking_unique_per_user_and_event(self):
+        """Test that the database rejects a duplicate booking"""
+        Booking.objects.create(user=self.attendee, event=self.event)
+        with self.assertRaises(IntegrityError):
+            Booking.objects.create(user=self.attendee, event=self.event)
+
+    def test_booking_costs_no_existence_check(self):
+        """Test that booking is an insert and a seat update"""
+        with self.assertNumQueries(4):
+            # Savepoint, insert, seat update, release savepoint
+            self.event.book(self.attendee)
+
+
+class EventCapacityTest(TestCase):
+    """Test capacity limits and the waitlist"""
+
+    def setUp(self):
+        self.client = Client()
+        self.host = User.objects.create_user(
+            username='host', password='testpass123')
+        self.users = [
+            User.objects.create_user(username=f'user{i}', password='x')
+            for i in range(4)
+        ]
+        self.event = Event.objects.create(
+            title='Small Event',
+            date=timezone.now() + timedelta(days=7),
+            location='Location',
+            host=self.host,
+            status=1,
+            capacity=2
+        )
+
+    def book(self, user):
+        self.client.force_login(user)
+        return self.client.post(
+            reverse('events:book_event', args=[self.event.slug]))
+
+    def cancel(self, user):
+        booking = Booking.objects.get(user=user, event=self.event)
+        self.client.force_login(user)
+        return self.client.post(
+            reverse('events:cancel_event',
+                    args=[self.event.slug, booking.id]))
+
+    def test_booking_stops_at_capacity(self):
+        """Test that bookings beyond capacity go to the waitlist"""
+        for user in self.users:
+            self.book(user)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 2)
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(
+            list(self.event.waitlist.values_list('user', flat=True)),
+            [self.users[2].id, self.users[3].id])
+
+    def test_cancel_promotes_waitlist_in_order(self):
+        """Test that a cancelled seat goes to the first waitlisted user"""
+        for user in self.users:
+            self.book(user)
+        self.cancel(self.users[0])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 2)
+        self.assertTrue(Booking.objects.filter(
+            user=self.users[2], event=self.event).exists())
+        self.assertEqual(
+            list(self.event.waitlist.values_list('user', flat=True)),
+            [self.users[3].id])
+
+    def test_cancel_without_waitlist_frees_seat(self):
+        """Test that cancelling releases the seat"""
+        self.book(self.users[0])
+        self.cancel(self.users[0])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 0)
+
+    def test_raising_capacity_promotes_waitlist(self):
+        """Test that editing capacity up books waitlisted users"""
+        for user in self.users:
+            self.book(user)
+        self.client.force_login(self.host)
+        self.client.post(
+            reverse('events:edit_event', args=[self.event.slug]), {
+                'title': 'Small Event',
+                'date': self.event.date.strftime('%Y-%m-%dT%H:%M'),
+                'location': 'Location',
+                'capacity': 4,
+            })
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 4)
+        self.assertEqual(WaitlistEntry.objects.count(), 0)
+
+    def test_edit_does_not_overwrite_seats_taken(self):
+        """Test that saving a stale instance keeps the seat counter"""
+        stale = Event.objects.get(pk=self.event.pk)
+        self.book(self.users[0])
+        stale.title = 'Renamed'
+        stale.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 1)
+
+    def test_leave_waitlist(self):
+        """Test that a user can leave the waitlist"""
+        for user in self.users[:3]:
+            self.book(user)
+        self.client.post(
+            reverse('events:leave_waitlist', args=[self.event.slug]))
+        self.assertEqual(WaitlistEntry.objects.count(), 0)
+
+    def test_capacity_below_booked_seats_invalid(self):
+        """Test that capacity can't be cut below booked seats"""
+        self.book(self.users[0])
+        self.book(self.users[1])
+        self.event.refresh_from_db()
+        form = HostEventForm(data={
+            'title': 'Small Event',
+            'date': self.event.date.strftime('%Y-%m-%dT%H:%M'),
+            'location': 'Location',
+            'capacity': 1,
+        }, instance=self.event)
+        self.assertFalse(form.is_valid())
+        self.assertIn('capacity', form.errors)
+
+    def test_dates_locked_once_booked(self):
+        """Test that booked or waitlisted events keep their dates"""
+        self.book(self.users[0])
+        self.event.refresh_from_db()
+        data = {
+            'title': 'Test Event',
+            'date': self.event.date.strftime('%Y-%m-%dT%H:%M'),
+            'location': 'Location',
+            'capacity': 2,
+        }
+        form = HostEventForm(data=data, instance=self.event)
+        self.assertTrue(form.is_valid())
+
+        moved = self.event.date + timedelta(days=1)
+        form = HostEventForm(data={
+            **data, 'date': moved.strftime('%Y-%m-%dT%H:%M'),
+            'repeat': 'weekly',
+        }, instance=self.event)
+        self.assertFalse(form.is_valid())
+        self.assertIn('date', form.errors)
+        self.assertIn('repeat', form.errors)
+
+
+class RecurringEventTest(TestCase):
+    """Test recurring events and booking single occurrences"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.host = User.objects.create_user(
+            username='host', password='testpass123')
+        self.attendee = User.objects.create_user(
+            username='attendee', password='testpass123')
+        # Started three weeks ago, so the first date is in the past
+        self.event = Event.objects.create(
+            title='Weekly Quiz',
+            date=(timezone.now() - timedelta(weeks=3)).replace(
+                microsecond=0),
+            location='Location',
+            host=self.host,
+            status=1,
+            capacity=1,
+            repeat='weekly',
+        )
+        self.next_date = self.event.next_occurrence()
+
+    def param(self, occurrence):
+        return timezone.localtime(occurrence).strftime('%Y-%m-%dT%H:%M:%S')
+
+    def book(self, user, occurrence):
+        self.client.force_login(user)
+        return self.client.post(
+            reverse('events:book_event', args=[self.event.slug]),
+            {'occurrence': self.param(occurrence)})
+
+    def test_weekly_series_keeps_local_time_over_dst(self):
+        """Test that weekly dates stay at the same wall-clock time"""
+        with timezone.override('Europe/London'):
+            event = Event(
+                date=timezone.make_aware(datetime(2030, 3, 20, 19)),
+                repeat='weekly')
+            dates = list(event.occurrences(
+                timezone.make_aware(datetime(2030, 3, 1)),
+                timezone.make_aware(datetime(2030, 4, 10))))
+        self.assertEqual(len(dates), 3)
+        self.assertEqual({date.hour for date in dates}, {19})
+
+    def test_monthly_series_clamps_to_month_end(self):
+        """Test that a monthly series on the 31st falls back in short months"""
+        event = Event(
+            date=timezone.make_aware(datetime(2030, 1, 31, 10)),
+            repeat='monthly',
+            repeat_until=datetime(2030, 4, 30).date())
+        dates = list(event.occurrences(
+            timezone.make_aware(datetime(2030, 1, 1)),
+            timezone.make_aware(datetime(2031, 1, 1))))
+        self.assertEqual(
+            [(date.month, date.day) for date in dates],
+            [(1, 31), (2, 28), (3, 31), (4, 30)])
+
+    def test_occurrences_are_not_stored(self):
+        """Test that a series is one row however many dates it has"""
+        year = list(self.event.occurrences(
+            timezone.now(), timezone.now() + timedelta(days=364)))
+        self.assertEqual(len(year), 52)
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertFalse(EventOccurrence.objects.exists())
+
+    def test_book_single_occurrence(self):
+        """Test that capacity applies to each date separately"""
+        later_date = self.next_date + timedelta(weeks=1)
+        self.book(self.attendee, self.next_date)
+        self.book(self.host, self.next_date)
+        self.book(self.host, later_date)
+
+        self.assertEqual(
+            Booking.objects.get(user=self.attendee).occurrence,
+            self.next_date)
+        self.assertTrue(WaitlistEntry.objects.filter(
+            user=self.host, occurrence=self.next_date).exists())
+        self.assertTrue(Booking.objects.filter(
+            user=self.host, occurrence=later_date).exists())
+        self.assertEqual(
+            list(EventOccurrence.objects.values_list(
+                'starts_at', 'seats_taken')),
+            [(self.next_date, 1), (later_date, 1)])
+        # The series row's own counters stay untouched
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 0)
+
+    def test_cancel_occurrence_promotes_its_waitlist(self):
+        """Test that a freed seat goes to that date's waitlist"""
+        self.book(self.attendee, self.next_date)
+        self.book(self.host, self.next_date)
+        booking = Booking.objects.get(user=self.attendee)
+        self.client.force_login(self.attendee)
+        self.client.post(reverse(
+            'events:cancel_event', args=[self.event.slug, booking.id]))
+        self.assertTrue(Booking.objects.filter(
+            user=self.host, occurrence=self.next_date).exists())
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_detail_shows_requested_occurrence(self):
+        """Test that the detail page shows the chosen date's booking"""
+        self.book(self.attendee, self.next_date)
+        later_date = self.next_date + timedelta(weeks=1)
+        url = reverse('events:event_detail', args=[self.event.slug])
+        response = self.client.get(url)
+        self.assertEqual(response.context['occurrence'], self.next_date)
+        self.assertIsNotNone(response.context['user_booking'])
+        response = self.client.get(
+            url, {'occurrence': self.param(later_date)})
+        self.assertEqual(response.context['occurrence'], later_date)
+        self.assertIsNone(response.context['user_booking'])
+
+    def test_unknown_occurrence_404(self):
+        """Test that a date outside the series is a 404"""
+        response = self.client.get(
+            reverse('events:event_detail', args=[self.event.slug]),
+            {'occurrence': self.param(self.next_date + timedelta(hours=1))})
+        self.assertEqual(response.status_code, 404)
+
+    def test_listing_includes_ongoing_series(self):
+        """Test that a series that started in the past is still listed"""
+        response = self.client.get(reverse('events:events_feed'))
+        self.assertIn(self.event, response.context['event_list'])
+        self.assertContains(response, 'Every week')
+        self.event.repeat_until = (timezone.now() - timedelta(days=1)).date()
+        self.event.save()
+        response = self.client.get(reverse('events:events_feed'))
+        self.assertNotIn(self.event, response.context['event_list'])
+
+    def test_form_rejects_end_before_start(self):
+        """Test that the last date can't precede the first"""
+        form = HostEventForm(data={
+            'title': 'Series',
+            'date': '2030-05-10T10:00',
+            'location': 'Location',
+            'description': 'Description',
+            'repeat': 'weekly',
+            'repeat_until': '2030-05-01',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('repeat_until', form.errors)
+
+
+class BookingCountTest(TestCase):
+    """Test the denormalized booking count"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.host = User.objects.create_user(
+            username='host', password='testpass123')
+        self.attendee = User.objects.create_user(
+            username='attendee', password='testpass123')
+        self.event = Event.objects.create(
+            title='Counted Event',
+            date=timezone.now() + timedelta(days=7),
+            location='Location',
+            host=self.host,
+            status=1
+        )
+
+    def test_book_and_cancel_update_count(self):
+        """Test that booking and cancelling keep the count in step"""
+        self.client.force_login(self.attendee)
+        self.client.post(
+            reverse('events:book_event', args=[self.event.slug]))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.booking_count, 1)
+
+        booking = Booking.objects.get()
+        self.client.post(
+            reverse('events:cancel_event',
+                    args=[self.event.slug, booking.id]))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.booking_count, 0)
+
+    def test_list_cards_show_count_without_extra_queries(self):
+        """Test that the listing query count doesn't grow with events"""
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('events:events_feed'))
+            return len(queries)
+
+        single = count_queries()
+        for i in range(5):
+            Event.objects.create(
+                title=f'Event {i}',
+                date=timezone.now() + timedelta(days=i + 1),
+                location='Location',
+                host=self.host,
+                status=1,
+                booking_count=i
+            )
+        self.assertEqual(count_queries(), single)
+        response = self.client.get(reverse('events:events_feed'))
+        self.assertContains(response, '4 going')
+
+    def test_reconcile_command_fixes_drift(self):
+        """Test that the reconcile command recomputes counters"""
+        Booking.objects.create(user=self.attendee, event=self.event)
+        Booking.objects.create(user=self.host, event=self.event)
+        call_command('reconcile_booking_counts', stdout=StringIO())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.booking_count, 2)
+        self.assertEqual(self.event.seats_taken, 2)
+
+    def test_reconcile_command_fixes_occurrences(self):
+        """Test that the counters of a series' dates are reconciled"""
+        series = Event.objects.create(
+            title='Weekly Event',
+            date=timezone.now() + timedelta(days=1),
+            location='Location',
+            host=self.host,
+            status=1,
+            repeat='weekly'
+        )
+        first, second = list(series.occurrences(
+            timezone.now(), timezone.now() + timedelta(weeks=2)))
+        series.book(self.attendee, first, seats=3)
+        series.book(self.attendee, second)
+        Booking.objects.create(
+            user=self.host, event=series, occurrence=first, seats=2)
+        EventOccurrence.objects.filter(starts_at=second).update(
+            booking_count=5, seats_taken=5)
+
+        out = StringIO()
+        call_command('reconcile_booking_counts', '--dry-run', stdout=out)
+        self.assertIn('5 bookings -> 1, 5 seats -> 1', out.getvalue())
+        call_command('reconcile_booking_counts', stdout=out)
+        self.assertIn('for 2 occurrences', out.getvalue())
+        self.assertEqual(
+            list(series.occurrence_counters.values_list(
+                'booking_count', 'seats_taken')),
+            [(2, 5), (1, 1)])
+
+
+class BookingConcurrencyTest(TransactionTestCase):
+    """Stress test concurrent bookings for a popular event"""
+
+    USERS = 200
+    CAPACITY = 50
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', password='x')
+        self.users = User.objects.bulk_create([
+            User(username=f'fan{i}') for i in range(self.USERS)
+        ])
+        self.event = Event.objects.create(
+            title='Popular Event',
+            date=timezone.now() + timedelta(days=7),
+            location='Location',
+            host=self.host,
+            status=1,
+            capacity=self.CAPACITY
+        )
+
+    @unittest.skipIf(connection.vendor == 'sqlite',
+                     'SQLite does not support concurrent writes reliably')
+    def test_concurrent_bookings_never_overbook(self):
+        """Test that hundreds of simultaneous bookings respect capacity"""
+        url = reverse('events:book_event', args=[self.event.slug])
+
+        def book(user):
+            try:
+                client = Client()
+                client.force_login(user)
+                return client.post(url).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=25) as pool:
+            statuses = list(pool.map(book, self.users))
+
+        self.event.refresh_from_db()
+        self.assertEqual(statuses, [302] * self.USERS)
+        self.assertEqual(Booking.objects.count(), self.CAPACITY)
+        self.assertEqual(self.event.seats_taken, self.CAPACITY)
+        self.assertEqual(
+            WaitlistEntry.objects.count(), self.USERS - self.CAPACITY)
+
+    def test_seat_taken_by_one_conditional_update(self):
+        """Test that booking never reads the counters under a lock"""
+        client = Client()
+        client.force_login(self.users[0])
+        with CaptureQueriesContext(connection) as queries:
+            client.post(
+                reverse('events:book_event', args=[self.event.slug]))
+        statements = [query['sql'] for query in queries.captured_queries]
+        updates = [
+            sql for sql in statements
+            if sql.startswith('UPDATE "events_event"')
+        ]
+        # The capacity check lives in the UPDATE's WHERE clause, so
+        # concurrent bookings don't queue on a row lock
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"seats_taken" <=', updates[0])
+        self.assertFalse(any('FOR UPDATE' in sql for sql in statements))
+
 
 class CancelEventViewTest(TestCase):
     """Test the cancel booking functionality"""
@@ -370,6 +1492,479 @@ class CancelEventViewTest(TestCase):
         self.assertEqual(response.status_code, 404)
         self.assertEqual(Booking.objects.count(), 1)  # Booking still exists
 
+    def test_double_submit_releases_seat_once(self):
+        """Test that a second cancel of the same booking frees nothing"""
+        self.event.capacity = 1
+        self.event.save()
+        self.event.reserve_seat()
+        waiting = User.objects.create_user(
+            username='waiting', password='testpass123')
+        WaitlistEntry.objects.create(user=waiting, event=self.event)
+        stale = Booking.objects.get(pk=self.booking.pk)
+        self.booking.delete()
+
+        # The second request looked the booking up before it was deleted
+        self.client.login(username='attendee', password='testpass123')
+        with mock.patch('events.views.get_object_or_404', return_value=stale):
+            self.client.post(reverse(
+                'events:cancel_event', args=[self.event.slug, stale.id]))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 1)
+        self.assertTrue(WaitlistEntry.objects.exists())
+
+
+class AttendeeRosterTest(TestCase):
+    """Test the host's attendee roster and CSV export"""
+
+    def setUp(self):
+        self.client = Client()
+        self.host = User.objects.create_user(
+            username='host', password='testpass123')
+        self.event = Event.objects.create(
+            title='Popular Event',
+            date=timezone.now() + timedelta(days=7),
+            location='Location',
+            host=self.host,
+            status=1
+        )
+        users = User.objects.bulk_create(
+            User(username=f'guest{i:03d}', email=f'guest{i}@example.com')
+            for i in range(120)
+        )
+        Booking.objects.bulk_create(
+            Booking(user=user, event=self.event) for user in users)
+        self.url = reverse('events:event_attendees', args=[self.event.slug])
+
+    def test_roster_is_host_only(self):
+        """Test that other users can't see the roster or export"""
+        self.client.force_login(User.objects.get(username='guest000'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        response = self.client.get(
+            reverse('events:export_attendees', args=[self.event.slug]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_roster_pages_cover_every_booking_once(self):
+        """Test that following next links visits each attendee once"""
+        self.client.force_login(self.host)
+        seen = []
+        url = self.url
+        while url:
+            response = self.client.get(url)
+            seen += [b.user.username for b in response.context['bookings']]
+            next_url = response.context['next_url']
+            url = self.url + next_url if next_url else None
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(len(set(seen)), 120)
+
+    def test_roster_page_query_count_is_constant(self):
+        """Test that users are joined instead of fetched per row"""
+        self.client.force_login(self.host)
+        self.client.get(self.url)
+        # Session, user, event and one page of bookings
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['bookings']), 50)
+
+    def test_export_streams_csv(self):
+        """Test that the export has a header and one row per booking"""
+        self.client.force_login(self.host)
+        response = self.client.get(
+            reverse('events:export_attendees', args=[self.event.slug]))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Username,Email,Date,Booked at')
+        self.assertEqual(len(lines), 121)
+        self.assertTrue(lines[1].startswith('guest000,guest0@example.com,'))
+
+
+class GroupBookingTest(TestCase):
+    """Test booking several spaces and several events at once"""
+
+    def setUp(self):
+        self.client = Client()
+        self.host = User.objects.create_user(
+            username='host', password='testpass123')
+        self.attendee = User.objects.create_user(
+            username='attendee', password='testpass123')
+        self.other = User.objects.create_user(
+            username='other', password='testpass123')
+        self.event = Event.objects.create(
+            title='Family Day',
+            date=timezone.now() + timedelta(days=7),
+            location='Location',
+            host=self.host,
+            status=1,
+            capacity=4
+        )
+        self.series = Event.objects.create(
+            title='Weekly Swim',
+            date=(timezone.now() + timedelta(days=1)).replace(microsecond=0),
+            location='Location',
+            host=self.host,
+            status=1,
+            capacity=2,
+            repeat='weekly'
+        )
+        self.dates = list(self.series.occurrences(
+            timezone.now(), timezone.now() + timedelta(weeks=3)))
+        self.client.force_login(self.attendee)
+
+    def item(self, event, occurrence=None):
+        if occurrence is None:
+            return event.slug
+        return event.slug + '|' + timezone.localtime(
+            occurrence).strftime('%Y-%m-%dT%H:%M:%S')
+
+    def test_book_several_spaces(self):
+        """Test that one booking holds a family's spaces"""
+        self.client.post(
+            reverse('events:book_event', args=[self.event.slug]),
+            {'seats': 3})
+        booking = Booking.objects.get()
+        self.assertEqual(booking.seats, 3)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 3)
+        self.assertEqual(self.event.booking_count, 1)
+
+        self.client.post(reverse(
+            'events:cancel_event', args=[self.event.slug, booking.id]))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 0)
+
+    def test_too_many_spaces_waitlisted(self):
+        """Test that a group larger than the spaces left isn't booked"""
+        self.event.book(self.other, seats=2)
+        self.client.post(
+            reverse('events:book_event', args=[self.event.slug]),
+            {'seats': 3})
+        self.assertFalse(Booking.objects.filter(user=self.attendee).exists())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 2)
+
+    def test_waitlisted_group_promoted_together(self):
+        """Test that a waitlisted group keeps its size when promoted"""
+        self.event.book(self.other, seats=2)
+        self.assertEqual(
+            self.event.book(self.attendee, seats=3), WAITLISTED)
+        self.assertEqual(WaitlistEntry.objects.get().seats, 3)
+        # One freed space isn't enough for the group, which keeps its place
+        self.event.book(self.host)
+        self.client.force_login(self.host)
+        self.client.post(reverse('events:cancel_event', args=[
+            self.event.slug, Booking.objects.get(user=self.host).id]))
+        self.assertTrue(WaitlistEntry.objects.exists())
+
+        self.client.force_login(self.other)
+        self.client.post(reverse('events:cancel_event', args=[
+            self.event.slug, Booking.objects.get(user=self.other).id]))
+        booking = Booking.objects.get(user=self.attendee)
+        self.assertEqual(booking.seats, 3)
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 3)
+        self.assertEqual(self.event.booking_count, 1)
+
+    def test_invalid_seat_count_rejected(self):
+        """Test that the number of spaces is bounded"""
+        response = self.client.post(
+            reverse('events:book_event', args=[self.event.slug]),
+            {'seats': 50}, follow=True)
+        self.assertContains(response, 'Please book between 1 and 10 spaces')
+        self.assertFalse(Booking.objects.exists())
+
+    def test_book_series_dates_in_one_batch(self):
+        """Test that several dates are booked with one bulk insert"""
+        items = [self.item(self.series, date) for date in self.dates]
+        items.append(self.item(self.event))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('events:book_events'), {
+                'booking': items, 'seats': 2})
+        inserts = [
+            q['sql'] for q in queries.captured_queries
+            if q['sql'].startswith('INSERT INTO "events_booking"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            Booking.objects.filter(user=self.attendee).count(),
+            len(self.dates) + 1)
+        self.assertEqual(
+            set(EventOccurrence.objects.values_list('seats_taken', flat=True)),
+            {2})
+
+    def test_partial_failure_reported(self):
+        """Test that full and already booked items are listed"""
+        self.series.book(self.other, self.dates[0], seats=2)
+        self.series.book(self.attendee, self.dates[1])
+        response = self.client.post(reverse('events:book_events'), {
+            'booking': [
+                self.item(self.series, date) for date in self.dates],
+        }, follow=True)
+        self.assertContains(response, 'Booked 1 event.')
+        self.assertContains(response, 'Not enough spaces left for: Weekly')
+        self.assertContains(response, 'You had already booked: Weekly')
+        self.assertTrue(Booking.objects.filter(
+            user=self.attendee, occurrence=self.dates[2]).exists())
+        self.assertFalse(Booking.objects.filter(
+            user=self.attendee, occurrence=self.dates[0]).exists())
+
+    def test_unknown_items_reported(self):
+        """Test that missing events and dates don't break the batch"""
+        response = self.client.post(reverse('events:book_events'), {
+            'booking': [
+                self.item(self.event), 'no-such-event',
+                self.item(self.series, self.dates[0] + timedelta(hours=1)),
+            ],
+        }, follow=True)
+        self.assertContains(response, "2 events couldn&#x27;t be found.")
+        self.assertTrue(Booking.objects.filter(event=self.event).exists())
+
+
+class RunRemindersCommandTest(TestCase):
+    """Test the run_reminders worker command"""
+
+    def setUp(self):
+        self.host = User.objects.create_user(
+            username='host', password='testpass123')
+        self.users = [
+            User.objects.create_user(username=f'user{i}', password='x')
+            for i in range(5)
+        ]
+        self.tomorrow = Event.objects.create(
+            title='Tomorrow Event',
+            date=timezone.now() + timedelta(hours=20),
+            location='Location',
+            host=self.host,
+            status=1
+        )
+        self.next_week = Event.objects.create(
+            title='Next Week Event',
+            date=timezone.now() + timedelta(days=7),
+            location='Location',
+            host=self.host,
+            status=1
+        )
+        for user in self.users:
+            Booking.objects.create(user=user, event=self.tomorrow)
+        Booking.objects.create(user=self.users[0], event=self.next_week)
+
+    def run_reminders(self, *args):
+        out = StringIO()
+        call_command('run_reminders', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reminds_bookings_starting_within_a_day(self):
+        """Test that only tomorrow's attendees are notified"""
+        output = self.run_reminders('--batch-size', '2')
+        self.assertIn('Sent 5 reminders', output)
+        notifications = Notification.objects.filter(
+            notification_type='event_reminder')
+        self.assertEqual(
+            set(notifications.values_list('recipient', flat=True)),
+            {user.id for user in self.users})
+        self.assertTrue(all(
+            n.related_event == self.tomorrow for n in notifications))
+        self.assertFalse(Booking.objects.filter(
+            event=self.tomorrow, reminder_sent_at__isnull=True).exists())
+        self.assertEqual(
+            ScheduledJob.objects.get(name='event-reminders').last_processed,
+            5)
+
+    def test_rerun_is_idempotent(self):
+        """Test that running again neither waits nor resends"""
+        self.run_reminders()
+        self.assertIn('not due', self.run_reminders())
+        self.assertIn('Sent 0 reminders', self.run_reminders('--force'))
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_reminds_booked_occurrence(self):
+        """Test that a booked date of a series gets its reminder"""
+        series = Event.objects.create(
+            title='Weekly Event',
+            date=timezone.now() - timedelta(days=6, hours=12),
+            location='Location',
+            host=self.host,
+            status=1,
+            repeat='weekly',
+        )
+        Booking.objects.create(
+            user=self.users[1], event=series,
+            occurrence=series.next_occurrence())
+        self.run_reminders()
+        self.assertTrue(Notification.objects.filter(
+            recipient=self.users[1], related_event=series).exists())
+
+
+class ArchiveEventsCommandTest(TestCase):
+    """Test archiving old events with the archive_events command"""
+
+    def setUp(self):
+        self.client = Client()
+        self.host = User.objects.create_user(
+            username='host', password='testpass123')
+        self.attendee = User.objects.create_user(
+            username='attendee', password='testpass123')
+        self.old = self.create(
+            'Old Event', timezone.now() - timedelta(days=200))
+        self.recent = self.create(
+            'Recent Event', timezone.now() - timedelta(days=5))
+        self.old_series = self.create(
+            'Old Series', timezone.now() - timedelta(days=400),
+            repeat='weekly',
+            repeat_until=(timezone.now() - timedelta(days=150)).date())
+        self.running_series = self.create(
+            'Running Series', timezone.now() - timedelta(days=400),
+            repeat='weekly')
+        self.booking = Booking.objects.create(
+            user=self.attendee, event=self.old, seats=2)
+
+    def create(self, title, date, **kwargs):
+        return Event.objects.create(
+            title=title, date=date, location='Location', host=self.host,
+            status=1, **kwargs)
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_events', '--batch-size', '1', *args,
+                     stdout=out)
+        return out.getvalue()
+
+    def test_moves_finished_events_and_bookings(self):
+        """Test that only events past the window are moved"""
+        self.assertIn('Archived 2 events', self.archive())
+        self.assertEqual(
+            sorted(Event.objects.values_list('title', flat=True)),
+            ['Recent Event', 'Running Series'])
+        self.assertEqual(
+            sorted(ArchivedEvent.objects.values_list('title', flat=True)),
+            ['Old Event', 'Old Series'])
+        archived = ArchivedBooking.objects.get()
+        self.assertEqual(archived.pk, self.booking.pk)
+        self.assertEqual(archived.event_id, self.old.pk)
+        self.assertEqual(archived.seats, 2)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_runs_once_a_day(self):
+        """Test that a second run the same day does nothing"""
+        self.archive()
+        self.assertIn('not due', self.archive())
+        self.assertIn('Archived 0 events', self.archive('--force'))
+
+    def test_archived_event_still_readable(self):
+        """Test that old links and the past events page still work"""
+        self.archive()
+        response = self.client.get(
+            reverse('events:event_detail', args=[self.old.slug]), follow=True)
+        self.assertContains(response, 'Old Event')
+        self.assertContains(response, 'This event has already past.')
+
+        self.client.force_login(self.attendee)
+        response = self.client.get(reverse('events:past_events'))
+        self.assertContains(response, 'Old Event')
+        self.client.force_login(self.host)
+        response = self.client.get(reverse('events:past_events'))
+        self.assertContains(response, 'Old Series')
+
+    def test_archived_slug_not_reused(self):
+        """Test that a new event doesn't take an archived event's slug"""
+        self.archive()
+        event = self.create('Old Event', timezone.now() + timedelta(days=5))
+        self.assertEqual(event.slug, 'old-event-1')
+        response = self.client.get(
+            reverse('events:event_detail', args=['old-event']))
+        self.assertRedirects(
+            response, reverse('events:archived_event', args=[self.old.pk]))
+
+
+class CalendarFeedTest(TestCase):
+    """Test the iCalendar downloads and subscription feed"""
+
+    def setUp(self):
+        self.client = Client()
+        self.host = User.objects.create_user(
+            username='host', password='testpass123')
+        self.attendee = User.objects.create_user(
+            username='attendee', password='testpass123')
+        self.event = Event.objects.create(
+            title='Picnic, in the park',
+            date=timezone.now() + timedelta(days=7),
+            location='Park',
+            host=self.host,
+            description='Bring food;\nand drinks',
+            status=1
+        )
+        self.feed_url = reverse(
+            'events:calendar_feed', args=[feed_token(self.attendee)])
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_event_ical_download(self):
+        """Test that a single event downloads as an escaped VEVENT"""
+        response = self.client.get(
+            reverse('events:event_ical', args=[self.event.slug]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = self.read(response)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn('SUMMARY:Picnic\\, in the park\r\n', body)
+        self.assertIn('DESCRIPTION:Bring food\\;\\nand drinks\r\n', body)
+
+    def test_event_ical_not_modified(self):
+        """Test that a conditional GET for an unchanged event is a 304"""
+        url = reverse('events:event_ical', args=[self.event.slug])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_feed_lists_booked_and_hosted_events(self):
+        """Test that the feed covers bookings and hosted events"""
+        Booking.objects.create(user=self.attendee, event=self.event)
+        Event.objects.create(
+            title='My Own Event',
+            date=timezone.now() + timedelta(days=3),
+            location='Hall',
+            host=self.attendee,
+            status=1
+        )
+        Event.objects.create(
+            title='Old Event',
+            date=timezone.now() - timedelta(days=3),
+            location='Hall',
+            host=self.attendee,
+            status=1
+        )
+        body = self.read(self.client.get(self.feed_url))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn('SUMMARY:My Own Event', body)
+        self.assertNotIn('Old Event', body)
+
+    def test_feed_poll_unchanged_is_cheap_304(self):
+        """Test that polling an unchanged feed returns 304"""
+        Booking.objects.create(user=self.attendee, event=self.event)
+        etag = self.client.get(self.feed_url)['ETag']
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                self.feed_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_feed_changes_after_cancel(self):
+        """Test that cancelling a booking changes the feed ETag"""
+        booking = Booking.objects.create(
+            user=self.attendee, event=self.event)
+        etag = self.client.get(self.feed_url)['ETag']
+        booking.delete()
+        response = self.client.get(self.feed_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_rejects_tampered_token(self):
+        """Test that a forged token is a 404"""
+        response = self.client.get(
+            reverse('events:calendar_feed', args=['1:forged']))
+        self.assertEqual(response.status_code, 404)
+
 
 class MyEventsViewTest(TestCase):
     """Test the my events view"""
@@ -439,6 +2034,60 @@ class MyEventsViewTest(TestCase):
         self.assertEqual(event.host, self.user)
         self.assertEqual(event.status, 1)  # Auto-published
 
+    def test_my_events_uses_two_queries(self):
+        """Test that the page costs two queries however many events"""
+        other_host = User.objects.create_user(
+            username='host', password='testpass123')
+        for days in (-7, -1, 1, 7):
+            Event.objects.create(
+                title=f'Hosted {days}',
+                date=timezone.now() + timedelta(days=days),
+                location='Location',
+                host=self.user,
+                status=1
+            )
+            booked = Event.objects.create(
+                title=f'Booked {days}',
+                date=timezone.now() + timedelta(days=days),
+                location='Location',
+                host=other_host,
+                status=1
+            )
+            Booking.objects.create(user=self.user, event=booked)
+        self.client.force_login(self.user)
+        self.client.get(reverse('events:my_events'))
+        # Session and user lookups, then hosted events and bookings
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('events:my_events'))
+        self.assertEqual(
+            [e.title for e in response.context['published_events']],
+            ['Hosted 7', 'Hosted 1'])
+        self.assertEqual(
+            [e.title for e in response.context['published_past']],
+            ['Hosted -1', 'Hosted -7'])
+        self.assertEqual(
+            [b.event.title for b in response.context['booked_upcoming']],
+            ['Booked 1', 'Booked 7'])
+        self.assertEqual(
+            [b.event.title for b in response.context['booked_past']],
+            ['Booked -7', 'Booked -1'])
+
+    def test_host_form_loaded_on_demand(self):
+        """Test that the form is served separately from the page"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('events:my_events'))
+        self.assertIsNone(response.context['event_form'])
+        response = self.client.get(reverse('events:host_event_form'))
+        self.assertContains(response, 'name="title"')
+
+    def test_invalid_submission_shows_form_errors(self):
+        """Test that a failed submission renders the bound form"""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('events:my_events'), {'title': 'No Date'})
+        self.assertTrue(response.context['event_form'].errors)
+        self.assertContains(response, 'name="title"')
+
 
 class EditEventViewTest(TestCase):
     """Test the edit event functionality"""
@@ -578,3 +2227,66 @@ class HostEventFormTest(TestCase):
         }
         form = HostEventForm(data=form_data)
         self.assertFalse(form.is_valid())
+
+    def test_featured_image_is_shrunk(self):
+        """Test that an uploaded photo is downscaled before upload"""
+        form_data = {
+            'title': 'Test Event',
+            'date': (
+                timezone.now() + timedelta(days=7)).strftime('%Y-%m-%dT%H:%M'),
+            'location': 'Test Location',
+        }
+        photo = ImageOptimisationTest.photo((4032, 3024))
+        form = HostEventForm(
+            data=form_data, files={'featured_image': photo})
+        self.assertTrue(form.is_valid())
+        image = Image.open(form.cleaned_data['featured_image'])
+        self.assertEqual(max(image.size), MAX_IMAGE_DIMENSION)
+
+
+class ImageOptimisationTest(TestCase):
+    """Test the image pipeline run before Cloudinary uploads"""
+
+    @staticmethod
+    def photo(size, image_format='JPEG', mode='RGB', exif=None):
+        output = BytesIO()
+        colour = (255, 165, 0, 128) if mode == 'RGBA' else 'orange'
+        image = Image.new(mode, size, colour)
+        options = {'exif': exif} if exif is not None else {}
+        image.save(output, image_format, **options)
+        return SimpleUploadedFile(
+            f'photo.{image_format.lower()}', output.getvalue())
+
+    def test_large_photo_downscaled(self):
+        """Test that the longest side is capped, keeping the aspect"""
+        result = optimise_image(self.photo((4032, 3024)))
+        image = Image.open(result)
+        self.assertEqual(image.size, (MAX_IMAGE_DIMENSION, 1200))
+        self.assertEqual(image.format, 'WEBP')
+        self.assertEqual(result.name, 'photo.webp')
+
+    def test_small_image_not_enlarged(self):
+        """Test that small images keep their size"""
+        image = Image.open(optimise_image(self.photo((300, 200))))
+        self.assertEqual(image.size, (300, 200))
+
+    def test_metadata_stripped_and_orientation_applied(self):
+        """Test that EXIF is dropped after rotating the image upright"""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 degrees clockwise
+        exif[0x010F] = 'Phone Maker'
+        image = Image.open(optimise_image(
+            self.photo((400, 300), exif=exif.tobytes())))
+        self.assertEqual(image.size, (300, 400))
+        self.assertEqual(len(image.getexif()), 0)
+
+    def test_transparency_kept(self):
+        """Test that transparent PNGs stay transparent"""
+        image = Image.open(optimise_image(
+            self.photo((50, 50), image_format='PNG', mode='RGBA')))
+        self.assertEqual(image.mode, 'RGBA')
+
+    def test_not_an_image_rejected(self):
+        """Test that a file Pillow can't read is a validation error"""
+        with self.assertRaises(ValidationError):
+            optimise_image(SimpleUploadedFile('photo.jpg', b'not an image'))
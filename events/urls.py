@@ -7,9 +7,31 @@ urlpatterns = [
     path('', views.EventsList.as_view(), name='events_feed'),
     path('event/<slug:slug>/', views.event_detail, name='event_detail'),
     path('event/<slug:slug>/book/', views.book_event, name='book_event'),
+    path('book/', views.book_events, name='book_events'),
     path('event/<slug:slug>/cancel/<int:booking_id>/',
          views.cancel_event, name='cancel_event'),
+    path('event/<slug:slug>/waitlist/leave/',
+         views.leave_waitlist, name='leave_waitlist'),
     path('event/<slug:slug>/edit/', views.edit_event, name='edit_event'),
+    path('event/<slug:slug>/edit-form/',
+         views.edit_event_form, name='edit_event_form'),
     path('event/<slug:slug>/delete/', views.delete_event, name='delete_event'),
+    path('event/<slug:slug>/attendees/',
+         views.event_attendees, name='event_attendees'),
+    path('event/<slug:slug>/attendees.csv',
+         views.export_attendees, name='export_attendees'),
+    path('event/<slug:slug>/calendar.ics',
+         views.event_ical, name='event_ical'),
+    path('calendar/', views.event_calendar, name='event_calendar'),
+    path('calendar/<int:year>/<int:month>/',
+         views.event_calendar, name='event_calendar'),
     path('myevents/', views.my_events, name='my_events'),
+    path('myevents/archive/', views.past_events, name='past_events'),
+    path('archive/<int:pk>/', views.archived_event, name='archived_event'),
+    path('myevents/host-form/',
+         views.host_event_form, name='host_event_form'),
+    path('digest/', views.weekly_digest, name='weekly_digest'),
+    path('digest.json', views.weekly_digest_json, name='weekly_digest_json'),
+    path('calendar/<str:token>.ics',
+         views.calendar_feed, name='calendar_feed'),
 ]
@@ -1,74 +1,468 @@
+import calendar
+import csv
+from datetime import date, datetime, time, timedelta
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Window
+from django.db.models.functions import Coalesce, RowNumber, TruncDate
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.http import (
+    Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+)
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from django.template.defaultfilters import pluralize
+from django.utils.http import http_date, urlencode
 from django.views import generic
+from django.views.decorators.http import condition
 from django.utils import timezone
+from .caching import (
+    CALENDAR_TIMEOUT_SECONDS, DIGEST_TIMEOUT_SECONDS,
+    EVENT_PAGE_TIMEOUT_SECONDS, LISTING_BUCKET_SECONDS, calendar_month_key,
+    digest_key, event_page_key, filter_options_key, upcoming_page_key
+)
+from .digest import digest_week
 from .forms import HostEventForm
-from .models import Event, Booking
+from .geocoding import DEFAULT_RADIUS_KM, RADIUS_CHOICES, geocode, near
+from .ical import (
+    FEED_CHUNK_SIZE, feed_token, stream_calendar, user_id_from_token
+)
+from .models import (
+    ALREADY_BOOKED, BOOKED, FULL, MAX_BOOKING_SEATS, WAITLISTED,
+    DIGEST_SECTIONS, ArchivedBooking, ArchivedEvent, DigestSection, Event,
+    Booking, WaitlistEntry, book_many, upcoming_q
+)
+from .recurrence import OCCURRENCE_FORMAT
+
+# Titles shown per day cell in the month calendar
+CALENDAR_TITLES_PER_DAY = 3
+
+# Upcoming dates of a series linked from its detail page
+OCCURRENCES_SHOWN = 6
+
+# Attendee roster page size, and rows fetched per round trip on export
+ATTENDEES_PER_PAGE = 50
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _requested_occurrence(event, value):
+    """
+    Return the occurrence of ``event`` named by ``value`` (its local start
+    time in OCCURRENCE_FORMAT), defaulting to the next one.
+
+    One-off events have no occurrences and always return None. Raises
+    Http404 if ``value`` isn't a date of the series.
+    """
+    if not event.is_recurring:
+        return None
+    if not value:
+        return event.next_occurrence()
+    try:
+        occurrence = timezone.make_aware(
+            datetime.strptime(value, OCCURRENCE_FORMAT))
+    except ValueError:
+        raise Http404("No such occurrence.")
+    if not event.has_occurrence(occurrence):
+        raise Http404("No such occurrence.")
+    return occurrence
 
 
 # Create your views here.
 
+def _date_param(value):
+    """Parse a ``YYYY-MM-DD`` query parameter, ignoring bad input."""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def _town_options():
+    """
+    Return ``[(town, total)]`` of upcoming published events per town for
+    the listing's town filter, computed by one grouped query and cached
+    like the listing pages.
+    """
+    key = filter_options_key()
+    options = cache.get(key)
+    if options is None:
+        options = list(
+            Event.objects.upcoming().filter(status=1).exclude(town='')
+            .order_by('town').values('town')
+            .annotate(total=Count('id')).values_list('town', 'total')
+        )
+        cache.set(key, options, LISTING_BUCKET_SECONDS)
+    return options
+
+
 class EventsList(generic.ListView):
-    # Current time
-    now = timezone.now()
+    """
+    List upcoming published events, optionally filtered by dates, a
+    keyword, a town or distance from a place.
 
-    queryset = Event.objects.filter(status=1, date__gte=now).order_by('date')
+    Each page is cached for the current minute and the cache is
+    invalidated whenever an event is created, edited or deleted.
+    """
     template_name = "events/index.html"
     paginate_by = 6
 
+    def get(self, request, *args, **kwargs):
+        self.keyword = request.GET.get('q', '').strip()
+        self.town = request.GET.get('town', '').strip()
+        self.date_from = _date_param(request.GET.get('from'))
+        self.date_to = _date_param(request.GET.get('to'))
+        self.near = request.GET.get('near', '').strip()
+        try:
+            self.radius = int(request.GET.get('radius', DEFAULT_RADIUS_KM))
+        except ValueError:
+            self.radius = DEFAULT_RADIUS_KM
+        if self.radius not in RADIUS_CHOICES:
+            self.radius = DEFAULT_RADIUS_KM
+        self.near_point = geocode(self.near)
+        return super().get(request, *args, **kwargs)
+
+    def get_filters(self):
+        """Active filters in a fixed order, for cache keys and links."""
+        filters = {}
+        if self.keyword:
+            filters['q'] = self.keyword
+        if self.date_from:
+            filters['from'] = self.date_from.isoformat()
+        if self.date_to:
+            filters['to'] = self.date_to.isoformat()
+        if self.town:
+            filters['town'] = self.town
+        if self.near_point:
+            filters['near'] = self.near
+            filters['radius'] = self.radius
+        return filters
+
+    def get_queryset(self):
+        # Ongoing series sort first, by the date they started
+        queryset = Event.objects.upcoming().filter(status=1).order_by('date')
+        if self.date_from or self.date_to:
+            tz = timezone.get_current_timezone()
+            start = end = None
+            if self.date_from:
+                start = timezone.make_aware(
+                    datetime.combine(self.date_from, time.min), tz)
+            # The last representable day has no next day to stop at, and
+            # needs no upper bound anyway
+            if self.date_to and self.date_to < date.max:
+                end = timezone.make_aware(
+                    datetime.combine(
+                        self.date_to + timedelta(days=1), time.min), tz)
+            queryset = queryset.between(start, end)
+        if self.keyword:
+            queryset = queryset.filter(
+                Q(title__icontains=self.keyword) |
+                Q(description__icontains=self.keyword))
+        if self.town:
+            queryset = queryset.filter(town=self.town)
+        if self.near_point:
+            queryset = near(queryset, *self.near_point, self.radius)
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        page_number = self.request.GET.get(self.page_kwarg) or 1
+        key = upcoming_page_key(page_number, urlencode(self.get_filters()))
+        cached = cache.get(key)
+        if cached is None:
+            paginator, page, object_list, is_paginated = (
+                super().paginate_queryset(queryset, page_size)
+            )
+            cached = (page.number, list(object_list), paginator.count)
+            cache.set(key, cached, LISTING_BUCKET_SECONDS)
+
+        # Rebuild the page from the cached rows without touching the db
+        number, object_list, count = cached
+        now = timezone.now()
+        for event in object_list:
+            event.next_date = (
+                event.next_occurrence(now) if event.is_recurring
+                else event.date
+            )
+        paginator = self.get_paginator(queryset, page_size)
+        paginator.count = count
+        page = Page(object_list, number, paginator)
+        return (paginator, page, object_list, paginator.num_pages > 1)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        filters = urlencode(self.get_filters())
+        context.update({
+            "keyword": self.keyword,
+            "town": self.town,
+            "town_options": _town_options(),
+            "date_from": self.date_from,
+            "date_to": self.date_to,
+            "near": self.near,
+            "radius": self.radius,
+            "radius_choices": RADIUS_CHOICES,
+            "near_unknown": bool(self.near) and not self.near_point,
+            # Prefix for pagination links so filters carry across pages
+            "filter_query": f"{filters}&" if filters else "",
+        })
+        return context
+
+
+def _is_cacheable_visit(request):
+    """
+    True for a plain GET from a visitor with no session or pending
+    messages. Such visitors are anonymous and see exactly the same page,
+    and checking costs no session lookup.
+    """
+    return (
+        request.method == 'GET'
+        and not request.GET
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
 
 def event_detail(request, slug):
     """
     Display the event details in its own page
+
+    For a recurring event, ``?occurrence=`` picks which date is shown and
+    booked, defaulting to the next one. Archived events redirect to their
+    read-only page.
+
+    Anonymous visitors are served a cached rendering stored with the
+    event's ``updated_on``, so a hit costs one cache get. Booking state
+    and host controls are only rendered on the uncached path.
     """
+    cacheable = _is_cacheable_visit(request)
+    if cacheable:
+        cached = cache.get(event_page_key(slug))
+        if cached is not None:
+            updated_on, content = cached
+            response = HttpResponse(content)
+            response['Last-Modified'] = http_date(updated_on.timestamp())
+            return response
+
+    event, response = _render_event_detail(request, slug)
+    if cacheable and event is not None and response.status_code == 200:
+        cache.set(
+            event_page_key(slug), (event.updated_on, response.content),
+            EVENT_PAGE_TIMEOUT_SECONDS)
+        response['Last-Modified'] = http_date(event.updated_on.timestamp())
+    return response
+
+
+def _render_event_detail(request, slug):
+    """Return the event and its detail page response."""
     # Current time
     now = timezone.now()
 
-    event = get_object_or_404(Event, slug=slug)
+    event = Event.objects.filter(slug=slug).first()
+    if event is None:
+        archived = (
+            ArchivedEvent.objects.filter(slug=slug).order_by('-date')
+            .values_list('pk', flat=True).first()
+        )
+        if archived is None:
+            raise Http404("No Event matches the given query.")
+        return None, redirect('events:archived_event', pk=archived)
+    occurrence = _requested_occurrence(
+        event, request.GET.get('occurrence'))
+
+    # Seat counters of the date on show
+    seats = event
+    upcoming_occurrences = []
+    if event.is_recurring:
+        upcoming_occurrences = list(event.occurrences(
+            now, now + timedelta(days=366)))[:OCCURRENCES_SHOWN]
+        if occurrence is not None:
+            seats = event.occurrence_counter(occurrence)
+        is_past = event.next_occurrence(now) is None
+    else:
+        is_past = event.date < now
 
     # If the user is authenticated, check whether they
     # have a booking for this event
     user_booking = None
+    user_waitlisted = False
+    is_host = False
     if request.user.is_authenticated:
         user_booking = (
             Booking.objects
-            .filter(event=event, user=request.user)
+            .filter(event=event, user=request.user, occurrence=occurrence)
             .first()
         )
+        if user_booking is None and seats.is_full:
+            user_waitlisted = event.waitlist.filter(
+                user=request.user, occurrence=occurrence).exists()
 
-        edit_form = HostEventForm(instance=event)
-    else:
-        edit_form = HostEventForm()
+        # Only the host gets the edit modal, whose form is fetched from
+        # edit_event_form when it is opened
+        is_host = event.host_id == request.user.id
+
+    # Precomputed neighbours, in rank order through the (event, rank) index
+    recommendations = [
+        recommendation.recommended
+        for recommendation in event.recommendations
+        .filter(recommended__status=1).select_related('recommended')
+    ]
 
-    return render(request, "events/event_detail.html", {
+    return event, render(request, "events/event_detail.html", {
         "event": event,
         "user_booking": user_booking,
-        "edit_form": edit_form,
+        "user_waitlisted": user_waitlisted,
+        "is_host": is_host,
         "now": now,
+        "occurrence": occurrence,
+        "starts_at": occurrence or event.date,
+        "upcoming_occurrences": upcoming_occurrences,
+        "seats": seats,
+        "is_past": is_past,
+        "max_booking_seats": MAX_BOOKING_SEATS,
+        "recommendations": recommendations,
     })
 
 
+def _detail_url(event, occurrence=None):
+    """Detail page URL, pointing at ``occurrence`` for a series."""
+    url = reverse('events:event_detail', args=[event.slug])
+    if occurrence is not None:
+        url += "?" + urlencode({'occurrence': timezone.localtime(
+            occurrence).strftime(OCCURRENCE_FORMAT)})
+    return url
+
+
+def _seats_param(value):
+    """Parse the number of spaces to book, or None if out of range."""
+    try:
+        seats = int(value or 1)
+    except ValueError:
+        return None
+    return seats if 1 <= seats <= MAX_BOOKING_SEATS else None
+
+
 @login_required
 def book_event(request, slug):
     """
-    Make a booking for an event
+    Make a booking for an event.
+
+    A seat is taken with an atomic conditional update, so the event can't
+    be overbooked. If the event is full the user joins the waitlist.
+    Recurring events are booked one occurrence at a time. A unique
+    constraint turns repeat submissions into "already booked".
     """
     event = get_object_or_404(Event, slug=slug)
 
     if request.method == "POST":
-        # Check if user has already booked this event
-        if Booking.objects.filter(event=event, user=request.user).exists():
-            messages.info(request, "You already booked this event.")
+        occurrence = _requested_occurrence(
+            event, request.POST.get('occurrence'))
+        if event.is_recurring and occurrence is None:
+            messages.info(request, "This event has no more dates.")
             return redirect('events:event_detail', slug=event.slug)
 
-        # Create booking
-        Booking.objects.create(user=request.user, event=event)
+        seats = _seats_param(request.POST.get('seats'))
+        if seats is None:
+            messages.error(
+                request,
+                f"Please book between 1 and {MAX_BOOKING_SEATS} spaces.")
+            return redirect(_detail_url(event, occurrence))
+
+        outcome = event.book(request.user, occurrence, seats)
+        if outcome == ALREADY_BOOKED:
+            messages.info(request, "You already booked this event.")
+            return redirect(_detail_url(event, occurrence))
+        if outcome == WAITLISTED:
+            messages.info(
+                request,
+                "This event is full. You have been added to the "
+                "waitlist and will be booked if a space opens up.")
+            return redirect(_detail_url(event, occurrence))
+
+        messages.success(request, "Your booking was successful!")
+        return redirect(_detail_url(event, occurrence))
 
-    messages.success(request, "Your booking was successful!")
     return redirect('events:event_detail', slug=slug)
 
 
+@login_required
+def book_events(request):
+    """
+    Book several events, or several dates of a series, in one go.
+
+    Each posted ``booking`` value is an event slug, optionally followed by
+    ``|`` and an occurrence for a series; ``seats`` applies to each of
+    them. Events are fetched with one query and all bookings are written
+    in one transaction by :func:`events.models.book_many`. Items that
+    couldn't be booked are listed in a warning.
+    """
+    if request.method != 'POST':
+        return redirect('events:events_feed')
+
+    wanted = []
+    for value in request.POST.getlist('booking'):
+        slug, _, occurrence = value.partition('|')
+        wanted.append((slug, occurrence))
+    events = Event.objects.filter(
+        status=1, slug__in={slug for slug, _ in wanted}).in_bulk(
+            field_name='slug')
+    if not events:
+        messages.info(request, "Please choose at least one event.")
+        return redirect('events:events_feed')
+    back = redirect('events:event_detail', slug=next(iter(events)))
+
+    seats = _seats_param(request.POST.get('seats'))
+    if seats is None:
+        messages.error(
+            request, f"Please book between 1 and {MAX_BOOKING_SEATS} spaces.")
+        return back
+
+    items = []
+    unavailable = []
+    for slug, value in wanted:
+        event = events.get(slug)
+        try:
+            occurrence = event and _requested_occurrence(event, value)
+        except Http404:
+            occurrence = None
+        if event is None or (event.is_recurring and occurrence is None):
+            unavailable.append(slug)
+            continue
+        items.append((event, occurrence, seats))
+
+    results = book_many(request.user, items) if items else []
+    failed = {ALREADY_BOOKED: [], FULL: []}
+    booked = 0
+    for event, occurrence, outcome in results:
+        if outcome == BOOKED:
+            booked += 1
+        else:
+            label = event.title
+            if occurrence is not None:
+                label += f" on {timezone.localtime(occurrence):%a %d %b}"
+            failed[outcome].append(label)
+
+    if booked:
+        messages.success(
+            request,
+            f"Booked {booked} event{pluralize(booked)}.")
+    for outcome, reason in (
+            (FULL, "Not enough spaces left for"),
+            (ALREADY_BOOKED, "You had already booked")):
+        if failed[outcome]:
+            messages.warning(
+                request, f"{reason}: {', '.join(failed[outcome])}.")
+    if unavailable:
+        messages.warning(
+            request,
+            f"{len(unavailable)} event{pluralize(len(unavailable))} "
+            f"couldn't be found.")
+
+    return back
+
+
 @login_required
 def cancel_event(request, slug, booking_id):
     """
@@ -82,13 +476,38 @@ def cancel_event(request, slug, booking_id):
     )
 
     if request.method == 'POST':
-        booking.delete()
+        with transaction.atomic():
+            event = booking.event
+            # A double submit passes the lookup twice; only the request
+            # that deleted the row gives its seats back
+            deleted, _ = Booking.objects.filter(pk=booking.pk).delete()
+            if deleted:
+                event.release_seat(booking.occurrence, booking.seats)
+                # Hand the freed seat to the next person on the waitlist
+                event.promote_waitlist(booking.occurrence)
         messages.success(request, "Your booking has been cancelled.")
-        return redirect('events:event_detail', slug=slug)
+        return redirect(_detail_url(event, booking.occurrence))
 
     return redirect('events:event_detail', slug=slug)
 
 
+@login_required
+def leave_waitlist(request, slug):
+    """
+    Remove the current user from the waitlist of an event.
+    """
+    event = get_object_or_404(Event, slug=slug)
+    occurrence = _requested_occurrence(
+        event, request.POST.get('occurrence'))
+
+    if request.method == 'POST':
+        WaitlistEntry.objects.filter(
+            event=event, user=request.user, occurrence=occurrence).delete()
+        messages.success(request, "You have left the waitlist.")
+
+    return redirect(_detail_url(event, occurrence))
+
+
 @login_required
 def edit_event(request, slug):
     """
@@ -108,7 +527,14 @@ def edit_event(request, slug):
             # Always publish edits (remove draft functionality)
             updated.status = 1
 
-            updated.save()
+            with transaction.atomic():
+                updated.save()
+                # A raised capacity frees seats for waitlisted users on
+                # every waitlisted date
+                for occurrence in (
+                        updated.waitlist.order_by()
+                        .values_list('occurrence', flat=True).distinct()):
+                    updated.promote_waitlist(occurrence)
             messages.success(request, "Event updated.")
             return redirect('events:event_detail', slug=event.slug)
         else:
@@ -121,6 +547,7 @@ def edit_event(request, slug):
         request,
         'events/event_detail.html',
         {'event': event,
+         'is_host': True,
          'edit_form': form,
          'show_edit_modal': True},
     )
@@ -147,39 +574,26 @@ def my_events(request):
     Handles:
         - Hosting event
         - View booked & booked past events
-    """
-    # Current time
-    now = timezone.now()
-
-    # Hosted Events
-    hosted_events = Event.objects.filter(
-        host=request.user
-        ).order_by('-created_on')
 
-    # Drafts removed: treat all hosted events as published
-    published_events = hosted_events.filter(date__gte=now)
+    The page is built from one query for the user's hosted events and one
+    for their bookings, both split into upcoming and past in Python. The
+    host event form is only rendered here when a submission failed;
+    otherwise the modal loads it from :view:`events.views.host_event_form`.
 
-    # Published past events hosted by the user
-    published_past = (
-        hosted_events.filter(date__lt=now, status=1)
-        .order_by('-date')
-    )
+    **Context**
 
-    # Booked Events
-    booked_upcoming = Booking.objects.filter(
-        user=request.user,
-        event__status=1,
-        event__date__gte=now
-    ).select_related('event').order_by('event__date')
+    ``published_events``, ``published_past``
+        Hosted :model:`events.Event` still to come, and finished ones.
+    ``booked_upcoming``, ``booked_past``
+        The user's :model:`events.Booking`, with ``starts_at`` set.
+    ``event_form``
+        A bound :form:`events.HostEventForm` with errors, or None.
 
-    # Past Events
-    booked_past = Booking.objects.filter(
-        user=request.user,
-        event__status=1,
-        event__date__lt=now).select_related('event').order_by('event__date')
+    **Template**
 
-    # Host Event Form
-    event_form = HostEventForm()
+    :template:`events/my_events.html`
+    """
+    event_form = None
 
     if request.method == "POST":
         event_form = HostEventForm(request.POST, request.FILES)
@@ -199,6 +613,35 @@ def my_events(request):
                 "There was an error with your form. "
                 "Please check your fields.")
 
+    # Current time
+    now = timezone.now()
+
+    # Hosted Events, split into upcoming and past
+    # Drafts removed: treat all hosted events as published
+    published_events = []
+    published_past = []
+    for event in Event.objects.filter(
+            host=request.user).order_by('-created_on'):
+        if event.is_upcoming(now):
+            published_events.append(event)
+        elif event.status == 1:
+            published_past.append(event)
+    published_past.sort(key=lambda event: event.date, reverse=True)
+
+    # Booked Events, starting at their occurrence or the event date
+    booked_upcoming = []
+    booked_past = []
+    for booking in Booking.objects.filter(
+        user=request.user,
+        event__status=1,
+    ).annotate(
+        starts_at=Coalesce('occurrence', 'event__date'),
+    ).select_related('event').order_by('starts_at'):
+        if booking.starts_at >= now:
+            booked_upcoming.append(booking)
+        else:
+            booked_past.append(booking)
+
     return render(
         request,
         "events/my_events.html",
@@ -208,5 +651,467 @@ def my_events(request):
             'event_form': event_form,
             'booked_upcoming': booked_upcoming,
             'booked_past': booked_past,
+            'calendar_feed_url': request.build_absolute_uri(
+                reverse('events:calendar_feed',
+                        args=[feed_token(request.user)])),
         },
     )
+
+
+@login_required
+def host_event_form(request):
+    """
+    Render the empty host event form for the My Events modal, fetched
+    when the modal is first opened.
+
+    **Template**
+
+    :template:`events/host_event_form.html`
+    """
+    return render(request, "events/host_event_form.html", {
+        'event_form': HostEventForm(),
+    })
+
+
+@login_required
+def edit_event_form(request, slug):
+    """
+    Render the host's edit form for an event, fetched when the edit modal
+    on the event page is first opened.
+
+    **Template**
+
+    :template:`events/host_event_form.html`
+    """
+    event = get_object_or_404(Event, slug=slug, host=request.user)
+    return render(request, "events/host_event_form.html", {
+        'event_form': HostEventForm(instance=event),
+    })
+
+
+def _event_last_modified(request, slug):
+    return (
+        Event.objects.filter(slug=slug)
+        .values_list('updated_on', flat=True)
+        .first()
+    )
+
+
+@condition(last_modified_func=_event_last_modified)
+def event_ical(request, slug):
+    """
+    Download a single event as an iCalendar (.ics) file.
+    """
+    event = get_object_or_404(Event, slug=slug)
+    response = StreamingHttpResponse(
+        stream_calendar([event], request, event.title),
+        content_type="text/calendar; charset=utf-8",
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{event.slug}.ics"'
+    )
+    return response
+
+
+def _calendar_feed_state(request, token):
+    """
+    Summarise everything that can change a user's calendar feed, using
+    one aggregate over their hosted events and one over their bookings.
+    Cached on the request as both conditional GET checks need it.
+    """
+    if not hasattr(request, "_calendar_feed_state"):
+        user_id = user_id_from_token(token)
+        state = None
+        if user_id is not None:
+            hosted = Event.objects.filter(host_id=user_id).aggregate(
+                latest=Max('updated_on'), total=Count('id'))
+            booked = Booking.objects.filter(user_id=user_id).aggregate(
+                latest=Max('event__updated_on'),
+                booked=Max('booked_at'),
+                total=Count('id'))
+            stamps = [
+                stamp for stamp in (
+                    hosted['latest'], booked['latest'], booked['booked'])
+                if stamp is not None
+            ]
+            latest = max(stamps) if stamps else None
+            state = {
+                'last_modified': latest,
+                'etag': (
+                    f"{user_id}-{latest.timestamp() if latest else 0}-"
+                    f"{hosted['total']}-{booked['total']}"
+                ),
+            }
+        request._calendar_feed_state = state
+    return request._calendar_feed_state
+
+
+def _calendar_feed_etag(request, token):
+    state = _calendar_feed_state(request, token)
+    return state and state['etag']
+
+
+def _calendar_feed_last_modified(request, token):
+    state = _calendar_feed_state(request, token)
+    return state and state['last_modified']
+
+
+@condition(
+    etag_func=_calendar_feed_etag,
+    last_modified_func=_calendar_feed_last_modified,
+)
+def calendar_feed(request, token):
+    """
+    Personal iCalendar subscription feed of upcoming booked and hosted
+    events.
+
+    The URL carries a signed token instead of a session so calendar apps
+    can poll it. Unchanged feeds are answered with 304 Not Modified after
+    two aggregate queries; otherwise events are streamed in chunks.
+    """
+    user_id = user_id_from_token(token)
+    if user_id is None:
+        raise Http404("Calendar feed not found.")
+
+    events = Event.objects.filter(
+        Q(host_id=user_id) |
+        Q(pk__in=Booking.objects.filter(user_id=user_id).values('event')),
+        upcoming_q(timezone.now()),
+        status=1,
+    ).order_by('date').only(
+        'pk', 'slug', 'title', 'date', 'location', 'description',
+        'updated_on', 'repeat', 'repeat_until',
+    )
+
+    return StreamingHttpResponse(
+        stream_calendar(
+            events.iterator(chunk_size=FEED_CHUNK_SIZE), request,
+            "Our Corner - My Events"),
+        content_type="text/calendar; charset=utf-8",
+    )
+
+
+def _calendar_days(year, month):
+    """
+    Return ``{date: (total, [events])}`` for published events in a month.
+
+    One query over the month's date range uses window functions to count
+    each day's events and keep only its first few, so the grid never
+    needs a query per day. A second query fetches the recurring series
+    running during the month, which are expanded in Python.
+    """
+    key = calendar_month_key(year, month)
+    days = cache.get(key)
+    if days is not None:
+        return days
+
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime(year, month, 1), tz)
+    end = timezone.make_aware(
+        datetime(year + month // 12, month % 12 + 1, 1), tz)
+    day = TruncDate('date', tzinfo=tz)
+    rows = (
+        Event.objects.filter(
+            status=1, repeat="", date__gte=start, date__lt=end)
+        .annotate(
+            day=day,
+            day_rank=Window(
+                RowNumber(), partition_by=[day], order_by=F('date').asc()),
+            day_total=Window(Count('id'), partition_by=[day]),
+        )
+        .filter(day_rank__lte=CALENDAR_TITLES_PER_DAY)
+        .order_by('date')
+        .values('day', 'day_total', 'title', 'slug', 'date')
+    )
+
+    series = (
+        Event.objects.filter(status=1, date__lt=end)
+        .exclude(repeat="")
+        .filter(
+            Q(repeat_until__isnull=True) | Q(repeat_until__gte=start.date()))
+        .only('title', 'slug', 'date', 'repeat', 'repeat_until')
+    )
+
+    days = {}
+    for row in rows:
+        total, events = days.setdefault(row['day'], (row['day_total'], []))
+        events.append(row)
+    for event in series:
+        for occurrence in event.occurrences(start, end):
+            total, events = days.get(occurrence.date(), (0, []))
+            events.append({
+                'title': event.title, 'slug': event.slug,
+                'date': occurrence,
+                'occurrence': occurrence.strftime(OCCURRENCE_FORMAT),
+            })
+            days[occurrence.date()] = (total + 1, events)
+    if series:
+        for day, (total, events) in days.items():
+            events.sort(key=lambda row: row['date'])
+            del events[CALENDAR_TITLES_PER_DAY:]
+    cache.set(key, days, CALENDAR_TIMEOUT_SECONDS)
+    return days
+
+
+def event_calendar(request, year=None, month=None):
+    """
+    Display published events as a month grid.
+
+    **Context**
+
+    ``weeks``
+        Lists of day cells with the day's event total and first titles.
+    ``month_start``, ``previous_month``, ``next_month``
+        Dates used for the heading and navigation. The neighbouring
+        months are None at the ends of the supported range.
+
+    **Template**
+
+    :template:`events/calendar.html`
+    """
+    today = timezone.localdate()
+    year = year or today.year
+    month = month or today.month
+    if not 1 <= month <= 12 or not 1 <= year <= 9998:
+        raise Http404("No such month.")
+
+    days = _calendar_days(year, month)
+    weeks = []
+    for week in calendar.Calendar().monthdatescalendar(year, month):
+        cells = []
+        for date in week:
+            total, events = days.get(date, (0, []))
+            cells.append({
+                'date': date,
+                'in_month': date.month == month,
+                'is_today': date == today,
+                'total': total,
+                'events': events,
+                'more': total - len(events),
+            })
+        weeks.append(cells)
+
+    month_start = datetime(year, month, 1).date()
+    # No links past the first and last months the view serves
+    previous_month = next_month = None
+    if (year, month) > (1, 1):
+        previous_month = (month_start - timedelta(days=1)).replace(day=1)
+    if (year, month) < (9998, 12):
+        next_month = (month_start + timedelta(days=31)).replace(day=1)
+    return render(request, "events/calendar.html", {
+        'weeks': weeks,
+        'month_start': month_start,
+        'previous_month': previous_month,
+        'next_month': next_month,
+        'weekdays': list(calendar.day_abbr),
+    })
+
+
+def _roster_cursor(booking):
+    """Keyset cursor pointing just after ``booking`` in the roster."""
+    return f"{booking.booked_at.isoformat()}|{booking.pk}"
+
+
+def _roster_after(bookings, cursor):
+    """
+    Filter ``bookings`` to those after ``cursor`` in (booked_at, id)
+    order. A malformed cursor starts from the beginning.
+    """
+    try:
+        booked_at, pk = cursor.rsplit("|", 1)
+        booked_at, pk = datetime.fromisoformat(booked_at), int(pk)
+    except ValueError:
+        return bookings
+    return bookings.filter(
+        Q(booked_at__gt=booked_at) | Q(booked_at=booked_at, pk__gt=pk))
+
+
+@login_required
+def event_attendees(request, slug):
+    """
+    Display the attendees of an event to its host.
+
+    Pages are keyset paginated over the (event, booked_at) index, so a
+    late page costs the same as the first.
+
+    **Context**
+
+    ``event``
+        The :model:`events.Event` hosted by the current user.
+    ``bookings``
+        One page of :model:`events.Booking` with their users.
+    ``next_url``
+        Link to the following page, if there is one.
+
+    **Template**
+
+    :template:`events/attendees.html`
+    """
+    event = get_object_or_404(Event, slug=slug, host=request.user)
+
+    bookings = _roster_after(
+        event.event_bookings.select_related('user')
+        .order_by('booked_at', 'pk'),
+        request.GET.get('after', ''),
+    )
+    # Fetch one extra row to learn whether there is a next page
+    bookings = list(bookings[:ATTENDEES_PER_PAGE + 1])
+    next_url = None
+    if len(bookings) > ATTENDEES_PER_PAGE:
+        bookings = bookings[:ATTENDEES_PER_PAGE]
+        next_url = "?" + urlencode({'after': _roster_cursor(bookings[-1])})
+
+    return render(request, "events/attendees.html", {
+        'event': event,
+        'bookings': bookings,
+        'next_url': next_url,
+        'is_first_page': 'after' not in request.GET,
+    })
+
+
+class _Echo:
+    """File-like object handing back each written row to the caller."""
+
+    def write(self, value):
+        return value
+
+
+@login_required
+def export_attendees(request, slug):
+    """
+    Download the attendees of an event as CSV, for its host.
+
+    Rows are streamed from a server-side cursor, so memory use stays
+    flat however many people booked.
+    """
+    event = get_object_or_404(Event, slug=slug, host=request.user)
+
+    rows = (
+        event.event_bookings.order_by('booked_at', 'pk')
+        .values_list(
+            'user__username', 'user__email', 'occurrence', 'booked_at')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    def stream():
+        writer = csv.writer(_Echo())
+        yield writer.writerow(["Username", "Email", "Date", "Booked at"])
+        for username, email, occurrence, booked_at in rows:
+            starts_at = timezone.localtime(occurrence or event.date)
+            yield writer.writerow([
+                username, email,
+                starts_at.strftime("%Y-%m-%d %H:%M"),
+                timezone.localtime(booked_at).strftime("%Y-%m-%d %H:%M"),
+            ])
+
+    response = StreamingHttpResponse(
+        stream(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = (
+        f'attachment; filename="{event.slug}-attendees.csv"'
+    )
+    return response
+
+
+def archived_event(request, pk):
+    """
+    Display a past event moved to the archive.
+
+    **Context**
+
+    ``event``
+        The :model:`events.ArchivedEvent`.
+
+    **Template**
+
+    :template:`events/archived_event.html`
+    """
+    event = get_object_or_404(
+        ArchivedEvent.objects.select_related('host'), pk=pk)
+    return render(request, "events/archived_event.html", {'event': event})
+
+
+@login_required
+def past_events(request):
+    """
+    Display the user's archived hosted and booked events, read from the
+    archive tables so the live pages never have to.
+
+    **Context**
+
+    ``hosted``
+        :model:`events.ArchivedEvent` hosted by the user.
+    ``bookings``
+        The user's :model:`events.ArchivedBooking` with their events.
+
+    **Template**
+
+    :template:`events/past_events.html`
+    """
+    return render(request, "events/past_events.html", {
+        'hosted': ArchivedEvent.objects.filter(host=request.user),
+        'bookings': (
+            ArchivedBooking.objects.filter(user=request.user)
+            .select_related('event').order_by('-booked_at')
+        ),
+    })
+
+
+def _digest(week_start):
+    """
+    Return the week's digest as served by the page and the JSON feed,
+    built from its stored sections with one query and, once every
+    section is built, cached until build_digest refreshes it.
+    """
+    key = digest_key(week_start)
+    digest = cache.get(key)
+    if digest is None:
+        stored = {
+            section.section: section
+            for section in DigestSection.objects.filter(
+                week_start=week_start, built_at__isnull=False)
+        }
+        digest = {
+            'week_start': week_start.isoformat(),
+            'sections': [
+                {
+                    'name': name,
+                    'title': title,
+                    'built_at': stored[name].built_at.isoformat(),
+                    'items': stored[name].items,
+                }
+                for name, title in DIGEST_SECTIONS if name in stored
+            ],
+        }
+        # A week still being built isn't cached, so a visit before the
+        # first build can't hide it until the timeout
+        if len(stored) == len(DIGEST_SECTIONS):
+            cache.set(key, digest, DIGEST_TIMEOUT_SECONDS)
+    return digest
+
+
+def weekly_digest(request):
+    """
+    Display this week's "what's on" digest of events, new marketplace
+    items and top posts, served from the snapshot built by build_digest.
+
+    **Context**
+
+    ``week_start``
+        Monday of the digest's week.
+    ``sections``
+        The built sections, each with a ``title`` and its ``items``.
+
+    **Template**
+
+    :template:`events/digest.html`
+    """
+    week_start = digest_week()
+    return render(request, "events/digest.html", {
+        'week_start': week_start,
+        'sections': _digest(week_start)['sections'],
+    })
+
+
+def weekly_digest_json(request):
+    """Return this week's digest as JSON."""
+    return JsonResponse(_digest(digest_week()))
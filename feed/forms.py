@@ -1,4 +1,5 @@
 from django import forms
+from events.images import OptimisedImageField
 from .models import Post, Comment
 
 
@@ -6,6 +7,7 @@ class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ("title", "content", "image")
+        field_classes = {"image": OptimisedImageField}
         widgets = {
             "title": forms.TextInput(
                 attrs={
@@ -2,6 +2,7 @@ from django.db.models import Q
 from feed.models import Post
 from events.models import Event
 from marketplace.models import SellingPost, BuyingPost, Listing
+from .snippets import annotate_snippet, build_snippet
 
 
 def search_all(query):
@@ -20,18 +21,25 @@ def search_all(query):
         }
 
     # Search in Feed Posts (title and content)
-    posts = Post.objects.filter(
-        Q(title__icontains=query) | Q(content__icontains=query),
-        accepted=True
-    ).select_related('author').order_by('-created_on')
+    # Only a window of the content around the match is fetched
+    posts = annotate_snippet(
+        Post.objects.filter(
+            Q(title__icontains=query) | Q(content__icontains=query),
+            accepted=True
+        ).select_related('author').defer('content').order_by('-created_on'),
+        'content', query
+    )
 
     # Search in Events (title, description, location)
-    events = Event.objects.filter(
-        Q(title__icontains=query) |
-        Q(description__icontains=query) |
-        Q(location__icontains=query),
-        status=1  # Only published events
-    ).select_related('host').order_by('-date')
+    events = annotate_snippet(
+        Event.objects.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(location__icontains=query),
+            status=1  # Only published events
+        ).select_related('host').defer('description').order_by('-date'),
+        'description', query
+    )
 
     # Search in Selling Posts (title and description)
     selling_posts = SellingPost.objects.filter(
@@ -46,14 +54,24 @@ def search_all(query):
     # Search in Auction Listings (title and description)
     listings = Listing.objects.filter(
         Q(title__icontains=query) | Q(description__icontains=query)
-    ).select_related('seller').order_by('-created_at')
+    ).select_related('seller').with_bid_stats().order_by('-created_at')
+
+    # Evaluate each result set once; the template and the total reuse them
+    posts = list(posts)
+    events = list(events)
+    selling_posts = list(selling_posts)
+    buying_posts = list(buying_posts)
+    listings = list(listings)
+
+    for result in posts + events:
+        result.snippet = build_snippet(result, query)
 
     total_count = (
-        posts.count() +
-        events.count() +
-        selling_posts.count() +
-        buying_posts.count() +
-        listings.count()
+        len(posts) +
+        len(events) +
+        len(selling_posts) +
+        len(buying_posts) +
+        len(listings)
     )
 
     return {
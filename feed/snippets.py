@@ -0,0 +1,110 @@
+import re
+
+from django.db import connections
+from django.db.models import Value
+from django.db.models.functions import Greatest, Lower, StrIndex, Substr
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+# Characters either side of the first match that are pulled from the
+# database. Only this window is ever transferred or highlighted, so the
+# cost per search result stays the same however long the content is.
+SNIPPET_RADIUS = 120
+
+# Markers wrapped around matched terms before escaping. ts_headline and
+# the Python highlighter both emit them, and format_snippet() turns them
+# into <mark> tags once the surrounding text is HTML-escaped.
+MARK_START = "\x02"
+MARK_STOP = "\x03"
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def annotate_snippet(queryset, field, query):
+    """
+    Annotate ``queryset`` with a bounded window of ``field`` around the
+    first match of ``query``.
+
+    Adds ``snippet_text`` (the window, highlighted by ``ts_headline`` on
+    PostgreSQL) and ``snippet_start`` (1-based offset of the window).
+    """
+    window_size = 2 * SNIPPET_RADIUS + len(query)
+    start = Greatest(
+        StrIndex(Lower(field), Lower(Value(query))) - SNIPPET_RADIUS,
+        Value(1),
+    )
+    # One extra character tells us whether the content continues
+    window = Substr(field, start, window_size + 1)
+
+    if connections[queryset.db].vendor == "postgresql":
+        from django.contrib.postgres.search import (
+            SearchHeadline, SearchQuery
+        )
+        window = SearchHeadline(
+            window,
+            SearchQuery(query, search_type="plain"),
+            start_sel=MARK_START,
+            stop_sel=MARK_STOP,
+            highlight_all=True,
+        )
+
+    return queryset.annotate(snippet_text=window, snippet_start=start)
+
+
+def highlight(text, query):
+    """
+    Wrap every token of ``text`` that starts with a query term in
+    highlight markers.
+
+    Token offsets are computed once for the window and the markers are
+    spliced in from those offsets, so the text is only walked once.
+    """
+    terms = tuple({term.lower() for term in TOKEN_RE.findall(query)})
+    if not terms:
+        return text
+
+    pieces = []
+    position = 0
+    for match in TOKEN_RE.finditer(text):
+        start, end = match.span()
+        if not match.group().lower().startswith(terms):
+            continue
+        pieces.append(text[position:start])
+        pieces.append(MARK_START + text[start:end] + MARK_STOP)
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def build_snippet(obj, query):
+    """
+    Return the highlighted, HTML-safe snippet for an object annotated
+    by :func:`annotate_snippet`.
+    """
+    text = obj.snippet_text or ""
+    plain = text.replace(MARK_START, "").replace(MARK_STOP, "")
+    clipped_start = obj.snippet_start > 1
+    clipped_end = len(plain) > 2 * SNIPPET_RADIUS + len(query)
+
+    if plain == text:
+        text = highlight(text, query)
+
+    # Drop words cut in half by the window edges
+    if clipped_start:
+        text = text.split(" ", 1)[-1]
+    if clipped_end:
+        text = text.rsplit(" ", 1)[0]
+
+    return format_snippet(
+        ("… " if clipped_start else "") + text.strip()
+        + (" …" if clipped_end else "")
+    )
+
+
+def format_snippet(text):
+    """Escape ``text`` and turn highlight markers into ``<mark>`` tags."""
+    return mark_safe(
+        escape(text)
+        .replace(MARK_START, "<mark>")
+        .replace(MARK_STOP, "</mark>")
+    )
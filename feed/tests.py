@@ -382,6 +382,44 @@ class SearchViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '0')
 
+    def test_search_highlights_match_in_snippet(self):
+        """Test that the matched term is highlighted in the snippet"""
+        Post.objects.create(
+            title='My Post',
+            content='This post is about kittens',
+            author=self.user,
+            accepted=True
+        )
+        response = self.client.get(reverse('feed:search'), {'q': 'kitten'})
+        self.assertContains(response, '<mark>kittens</mark>')
+
+    def test_search_snippet_is_bounded_for_long_content(self):
+        """Test that a match deep in long content gets a short snippet"""
+        Post.objects.create(
+            title='Long Post',
+            content='filler ' * 20000 + 'kitten' + ' tail' * 20000,
+            author=self.user,
+            accepted=True
+        )
+        response = self.client.get(reverse('feed:search'), {'q': 'kitten'})
+        snippet = str(response.context['posts'][0].snippet)
+        self.assertIn('<mark>kitten</mark>', snippet)
+        self.assertTrue(snippet.startswith('… '))
+        self.assertTrue(snippet.endswith(' …'))
+        self.assertLess(len(snippet), 400)
+
+    def test_search_snippet_escapes_content(self):
+        """Test that post content is escaped in the snippet"""
+        Post.objects.create(
+            title='My Post',
+            content='<script>kitten</script>',
+            author=self.user,
+            accepted=True
+        )
+        response = self.client.get(reverse('feed:search'), {'q': 'kitten'})
+        self.assertContains(
+            response, '&lt;script&gt;<mark>kitten</mark>&lt;/script&gt;')
+
 
 # ===== PAGINATION TESTS =====
 
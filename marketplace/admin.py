@@ -13,7 +13,9 @@ class ListingAdmin(admin.ModelAdmin):
     ]
     list_filter = ['created_at', 'ends_at']
     search_fields = ['title', 'description', 'seller__username']
-    readonly_fields = ['created_at', 'updated_at', 'current_price']
+    readonly_fields = [
+        'created_at', 'updated_at', 'closed_at', 'current_price'
+    ]
     fieldsets = (
         ('Basic Information', {
             'fields': ('seller', 'title', 'description', 'image')
@@ -25,7 +27,7 @@ class ListingAdmin(admin.ModelAdmin):
             )
         }),
         ('Timing', {
-            'fields': ('ends_at', 'created_at', 'updated_at')
+            'fields': ('ends_at', 'closed_at', 'created_at', 'updated_at')
         }),
     )
 
@@ -5,3 +5,5 @@ class MarketplaceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'marketplace'
 
+    def ready(self):
+        import marketplace.signals
@@ -0,0 +1,24 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Bid
+
+
+def actual_bid_stats():
+    """
+    Expressions recomputing a listing's denormalized bid fields from its
+    bids, for ``update()`` or ``annotate()`` on listings.
+    """
+    bids = Bid.objects.filter(listing=OuterRef('pk'))
+    top = bids.order_by('-amount', 'created_at')
+    return {
+        'bid_count': Coalesce(
+            Subquery(
+                bids.order_by().values('listing')
+                .annotate(count=Count('pk')).values('count')
+            ),
+            0,
+        ),
+        'top_bid': Subquery(top.values('pk')[:1]),
+        'top_bidder': Subquery(top.values('bidder')[:1]),
+        'current_price': Subquery(top.values('amount')[:1]),
+    }
@@ -0,0 +1,18 @@
+from django.core.cache import cache
+
+# Tab counts are dropped whenever an item is added or removed; the
+# timeout only bounds drift from changes made outside the ORM
+TAB_COUNTS_TIMEOUT_SECONDS = 5 * 60
+
+TAB_COUNTS_KEY = "marketplace:tab-counts"
+
+
+def my_items_count_key(user_id):
+    """Cache key for the number of items a user has on the marketplace."""
+    return f"marketplace:my-items-count:{user_id}"
+
+
+def invalidate_tab_counts(user_id):
+    """Drop the cached feed tab counts after ``user_id`` adds or removes
+    an item."""
+    cache.delete_many([TAB_COUNTS_KEY, my_items_count_key(user_id)])
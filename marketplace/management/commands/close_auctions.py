@@ -0,0 +1,133 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from events.digest import mark_stale
+from events.models import ScheduledJob
+from marketplace.models import Listing, Notification
+
+JOB_NAME = "close-auctions"
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    """
+    Finalize :model:`marketplace.Listing` auctions whose end time has
+    passed: the leading bid wins if it meets the reserve price, the
+    listing is marked sold and the winner and seller are sent a
+    :model:`marketplace.Notification`.
+
+    Meant to run from cron every minute. Each batch locks its listings,
+    writes its notifications with one insert and stamps the listings as
+    closed in the same transaction, so a crash or an overlapping worker
+    never closes an auction twice.
+    """
+    help = "Close ended auctions and notify their winners and sellers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Listings closed per transaction.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even if the job isn't due yet.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        job = ScheduledJob.claim(JOB_NAME, now, force=options["force"])
+        if job is None:
+            self.stdout.write("Closing auctions is not due yet.")
+            return
+
+        # Served by the partial index on open auctions
+        due = Listing.objects.filter(
+            closed_at__isnull=True, is_sold=False, ends_at__lte=now)
+
+        closed = sold = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    due.select_for_update(skip_locked=True, of=("self",))
+                    .select_related("top_bid__bidder")
+                    .only(
+                        "title", "seller_id", "reserve_price",
+                        "top_bid__amount", "top_bid__bidder__username",
+                    )
+                    .order_by("ends_at")[:options["batch_size"]]
+                )
+                if not batch:
+                    break
+                won = {
+                    listing.pk for listing in batch
+                    if self.reserve_met(listing)
+                }
+                Notification.objects.bulk_create(
+                    notification
+                    for listing in batch
+                    for notification in self.notifications(
+                        listing, listing.pk in won)
+                )
+                # The rows are locked, so top_bid is still the one read
+                Listing.objects.filter(pk__in=won).update(
+                    accepted_bid=F("top_bid"), is_sold=True)
+                Listing.objects.filter(
+                    pk__in=[listing.pk for listing in batch]
+                ).update(closed_at=now, updated_at=now)
+            closed += len(batch)
+            sold += len(won)
+
+        if sold:
+            # Sold auctions drop out of the weekly digest
+            mark_stale("listings", now)
+        job.finish(closed)
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {closed} auctions, {sold} sold."))
+
+    def reserve_met(self, listing):
+        bid = listing.top_bid
+        return bid is not None and (
+            listing.reserve_price is None or
+            bid.amount >= listing.reserve_price
+        )
+
+    def notifications(self, listing, won):
+        bid = listing.top_bid
+        if won:
+            yield Notification(
+                recipient_id=bid.bidder_id,
+                sender_id=listing.seller_id,
+                notification_type="auction_won",
+                message=(
+                    f"You won the auction for {listing.title} with your "
+                    f"bid of £{bid.amount}. The seller will be in touch."
+                ),
+                related_listing_id=listing.pk,
+            )
+            message = (
+                f"Your auction for {listing.title} has ended. "
+                f"{bid.bidder.username} won it with a bid of £{bid.amount}."
+            )
+        elif bid is not None:
+            message = (
+                f"Your auction for {listing.title} has ended without a "
+                f"sale: the highest bid of £{bid.amount} was below your "
+                f"reserve price of £{listing.reserve_price}."
+            )
+        else:
+            message = (
+                f"Your auction for {listing.title} has ended without "
+                f"any bids."
+            )
+        yield Notification(
+            recipient_id=listing.seller_id,
+            sender_id=bid.bidder_id if won else listing.seller_id,
+            notification_type="auction_ended",
+            message=message,
+            related_listing_id=listing.pk,
+        )
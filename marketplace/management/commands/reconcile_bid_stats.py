@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from marketplace.bids import actual_bid_stats
+from marketplace.models import Listing
+
+
+class Command(BaseCommand):
+    """
+    Recompute the denormalized bid_count, top_bid, top_bidder and
+    current_price columns on :model:`marketplace.Listing` from the
+    :model:`marketplace.Bid` table.
+    """
+    help = "Fix listings whose bid stats drifted from their bids."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted listings without updating them.",
+        )
+
+    def handle(self, *args, **options):
+        actual = actual_bid_stats()
+        # Compare top bids as ids with 0 for none, so NULLs compare equal
+        drifted = Listing.objects.annotate(
+            actual_count=actual["bid_count"],
+            actual_top=Coalesce(actual["top_bid"], 0),
+            stored_top=Coalesce("top_bid", 0),
+        ).filter(
+            ~Q(bid_count=F("actual_count")) | ~Q(stored_top=F("actual_top"))
+        )
+
+        if options["dry_run"]:
+            for listing in drifted.only("pk", "bid_count"):
+                self.stdout.write(
+                    f"{listing.pk}: {listing.bid_count} bids -> "
+                    f"{listing.actual_count}, top bid "
+                    f"{listing.stored_top or None} -> "
+                    f"{listing.actual_top or None}"
+                )
+            return
+
+        fixed = Listing.objects.filter(
+            pk__in=drifted.values("pk")
+        ).update(**actual)
+        self.stdout.write(
+            self.style.SUCCESS(f"Reconciled bid stats for {fixed} listings.")
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_scheduled_jobs'),
+        ('marketplace', '0003_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='related_event',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='events.event'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('purchase', 'Purchase Commitment'), ('bid', 'New Bid'), ('bid_accepted', 'Bid Accepted'), ('event_reminder', 'Event Reminder')], max_length=20),
+        ),
+    ]
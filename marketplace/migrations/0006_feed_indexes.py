@@ -0,0 +1,21 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0005_keep_reminders_of_archived_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='buyingpost',
+            index=models.Index(fields=['-created_at'], name='marketplace_created_0106c5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sellingpost',
+            index=models.Index(fields=['-created_at'], name='marketplace_created_256f3b_idx'),
+        ),
+    ]
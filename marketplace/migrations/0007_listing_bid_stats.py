@@ -0,0 +1,52 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def backfill_bid_stats(apps, schema_editor):
+    Bid = apps.get_model('marketplace', 'Bid')
+    Listing = apps.get_model('marketplace', 'Listing')
+    bids = Bid.objects.filter(listing=models.OuterRef('pk'))
+    top = bids.order_by('-amount', 'created_at')
+    Listing.objects.update(
+        bid_count=Coalesce(
+            models.Subquery(
+                bids.order_by().values('listing')
+                .annotate(count=models.Count('pk')).values('count')
+            ),
+            0,
+        ),
+        top_bid=models.Subquery(top.values('pk')[:1]),
+        top_bidder=models.Subquery(top.values('bidder')[:1]),
+        current_price=models.Subquery(top.values('amount')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('marketplace', '0006_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='top_bid',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='marketplace.bid'),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='top_bidder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_bid_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0007_listing_bid_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('purchase', 'Purchase Commitment'), ('bid', 'New Bid'), ('bid_accepted', 'Bid Accepted'), ('event_reminder', 'Event Reminder'), ('auction_won', 'Auction Won'), ('auction_ended', 'Auction Ended')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('closed_at__isnull', True), ('is_sold', False)), fields=['ends_at'], name='listing_open_ends_at'),
+        ),
+    ]
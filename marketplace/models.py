@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import F, Q
 from cloudinary.models import CloudinaryField
 from django.utils import timezone
 
@@ -11,6 +12,9 @@ class Notification(models.Model):
         ('purchase', 'Purchase Commitment'),
         ('bid', 'New Bid'),
         ('bid_accepted', 'Bid Accepted'),
+        ('event_reminder', 'Event Reminder'),
+        ('auction_won', 'Auction Won'),
+        ('auction_ended', 'Auction Ended'),
     )
 
     recipient = models.ForeignKey(
@@ -29,6 +33,9 @@ class Notification(models.Model):
     related_selling_post = models.ForeignKey(
         'SellingPost', on_delete=models.CASCADE, null=True, blank=True
     )
+    related_event = models.ForeignKey(
+        'events.Event', on_delete=models.SET_NULL, null=True, blank=True
+    )
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -60,6 +67,11 @@ class SellingPost(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     image = CloudinaryField('image', default='placeholder')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -72,6 +84,11 @@ class BuyingPost(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     image = CloudinaryField('image', default='placeholder')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -88,6 +105,20 @@ class MarketComment(models.Model):
         return f'Comment by {self.author.username} on {self.post.title}'
 
 
+class ListingQuerySet(models.QuerySet):
+    def with_bid_stats(self):
+        """
+        Annotate each listing with ``highest_bid`` (the amount) and
+        ``highest_bidder`` (a username) from the denormalized top bid,
+        joined in the same query, so listing cards need no queries of
+        their own. ``bid_count`` comes from the row.
+        """
+        return self.annotate(
+            highest_bid=F('top_bid__amount'),
+            highest_bidder=F('top_bidder__username'),
+        )
+
+
 class Listing(models.Model):
     """Auction-style listing where users can bid"""
     seller = models.ForeignKey(
@@ -109,6 +140,23 @@ class Listing(models.Model):
     current_price = models.DecimalField(
         max_digits=12, decimal_places=2, null=True, blank=True
     )
+    # Also denormalized, only changed by record_bid while the listing row
+    # is locked, and recomputed by the reconcile_bid_stats command
+    bid_count = models.PositiveIntegerField(default=0)
+    top_bid = models.ForeignKey(
+        'Bid',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    top_bidder = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
     image = CloudinaryField('image', default='placeholder')
     is_sold = models.BooleanField(default=False)  # Track if item has been sold
     # The winning bid
@@ -119,19 +167,44 @@ class Listing(models.Model):
         blank=True,
         related_name='accepted_for_listing'
     )
+    # Set by the close_auctions command once the auction has ended and
+    # its winner, if any, has been recorded
+    closed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ListingQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['ends_at']),
+            # Auctions still waiting for close_auctions, so closed ones
+            # never slow its scan down
+            models.Index(
+                fields=['ends_at'],
+                condition=Q(closed_at__isnull=True, is_sold=False),
+                name='listing_open_ends_at'),
         ]
 
     def __str__(self):
         return self.title
 
+    def record_bid(self, bid):
+        """
+        Make ``bid`` the listing's leading bid in the denormalized fields.
+        Call it with the listing row locked, right after creating the bid.
+        """
+        self.current_price = bid.amount
+        self.bid_count += 1
+        self.top_bid = bid
+        self.top_bidder_id = bid.bidder_id
+        self.save(update_fields=[
+            'current_price', 'bid_count', 'top_bid', 'top_bidder',
+            'updated_at',
+        ])
+
     def get_highest_bid(self):
         """Get the current highest bid for this listing"""
         return self.bids.order_by('-amount', 'created_at').first()
@@ -142,14 +215,14 @@ class Listing(models.Model):
 
     def get_minimum_bid(self):
         """Calculate the minimum valid bid amount"""
-        highest = self.get_highest_bid()
-        if highest:
-            return highest.amount + self.min_increment
+        # current_price is the leading bid's amount once there is one
+        if self.top_bid_id is not None:
+            return self.current_price + self.min_increment
         return self.starting_price
 
     def can_accept_bids(self):
         """Check if seller can manually accept bids"""
-        return not self.is_sold and self.bids.exists()
+        return not self.is_sold and self.top_bid_id is not None
 
     def get_winner(self):
         """
@@ -159,7 +232,7 @@ class Listing(models.Model):
         if self.accepted_bid:
             return self.accepted_bid
         if self.is_auction_ended():
-            return self.get_highest_bid()
+            return self.top_bid
         return None
 
 
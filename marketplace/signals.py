@@ -0,0 +1,55 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from events.digest import mark_stale
+from .bids import actual_bid_stats
+from .caching import invalidate_tab_counts
+from .models import Bid, BuyingPost, Listing, SellingPost
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_save, sender=SellingPost)
+def invalidate_tab_counts_on_create(sender, instance, created, **kwargs):
+    # Bids and sales save the item too but never change the counts
+    if created:
+        invalidate_tab_counts(instance.seller_id)
+
+
+@receiver(post_delete, sender=Listing)
+@receiver(post_delete, sender=SellingPost)
+def invalidate_tab_counts_on_delete(sender, instance, **kwargs):
+    invalidate_tab_counts(instance.seller_id)
+
+
+@receiver(post_save, sender=BuyingPost)
+def invalidate_wanted_count_on_create(sender, instance, created, **kwargs):
+    if created:
+        invalidate_tab_counts(instance.buyer_id)
+
+
+@receiver(post_delete, sender=BuyingPost)
+def invalidate_wanted_count_on_delete(sender, instance, **kwargs):
+    invalidate_tab_counts(instance.buyer_id)
+
+
+@receiver(post_save, sender=Listing)
+def mark_digest_listings_stale_on_save(
+        sender, instance, created, update_fields, **kwargs):
+    # Bids save the listing with update_fields but never change what the
+    # digest shows; new listings, edits and sales do
+    if created or update_fields is None or 'is_sold' in update_fields:
+        mark_stale("listings")
+
+
+@receiver(post_delete, sender=Listing)
+@receiver(post_save, sender=SellingPost)
+@receiver(post_delete, sender=SellingPost)
+def mark_digest_listings_stale(sender, **kwargs):
+    mark_stale("listings")
+
+
+@receiver(post_delete, sender=Bid)
+def refresh_bid_stats_on_delete(sender, instance, **kwargs):
+    # Bids are only removed outside place_bid, e.g. from the admin, so
+    # recompute rather than adjust the stored count and leader
+    Listing.objects.filter(pk=instance.listing_id).update(
+        **actual_bid_stats())
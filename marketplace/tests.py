@@ -1,6 +1,10 @@
 import unittest
+from io import StringIO
+from django.core.management import call_command
 from django.test import TestCase, TransactionTestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.urls import reverse
 from django.utils import timezone
 from django.db import connection
@@ -9,6 +13,7 @@ from datetime import timedelta
 from threading import Thread
 from time import sleep
 from .models import Listing, Bid, SellingPost, BuyingPost, Notification, MarketComment
+from .views import FEED_PAGE_SIZE
 
 
 class ListingModelTest(TestCase):
@@ -37,7 +42,8 @@ class ListingModelTest(TestCase):
     def test_get_minimum_bid_with_bids(self):
         """Test minimum bid calculation with existing bids"""
         bidder = User.objects.create_user(username='bidder', password='testpass123')
-        Bid.objects.create(listing=self.listing, bidder=bidder, amount=Decimal('15.00'))
+        self.listing.record_bid(Bid.objects.create(
+            listing=self.listing, bidder=bidder, amount=Decimal('15.00')))
 
         expected_min = Decimal('15.00') + Decimal('1.00')  # 15 + 1 = 16
         self.assertEqual(self.listing.get_minimum_bid(), expected_min)
@@ -53,6 +59,73 @@ class ListingModelTest(TestCase):
         self.assertEqual(self.listing.get_highest_bid(), highest_bid)
         self.assertEqual(self.listing.get_highest_bid().amount, Decimal('20.00'))
 
+    def test_with_bid_stats(self):
+        """Test the bid annotations on listing querysets"""
+        bidder1 = User.objects.create_user(username='bidder1', password='testpass123')
+        bidder2 = User.objects.create_user(username='bidder2', password='testpass123')
+        for bidder, amount in ((bidder1, '15.00'), (bidder2, '20.00')):
+            self.listing.record_bid(Bid.objects.create(
+                listing=self.listing, bidder=bidder, amount=Decimal(amount)))
+        empty = Listing.objects.create(
+            seller=self.user, title='Empty', starting_price=Decimal('5.00'))
+
+        listings = Listing.objects.with_bid_stats().in_bulk()
+        listing = listings[self.listing.pk]
+        self.assertEqual(listing.highest_bid, Decimal('20.00'))
+        self.assertEqual(listing.highest_bidder, 'bidder2')
+        self.assertEqual(listing.bid_count, 2)
+        self.assertEqual(listing.top_bid.amount, Decimal('20.00'))
+        self.assertIsNone(listings[empty.pk].highest_bid)
+        self.assertEqual(listings[empty.pk].bid_count, 0)
+        self.assertIsNone(listings[empty.pk].top_bid_id)
+
+    def test_reconcile_bid_stats(self):
+        """Test that reconcile_bid_stats recomputes drifted stats"""
+        bidder = User.objects.create_user(username='bidder', password='testpass123')
+        Bid.objects.create(listing=self.listing, bidder=bidder, amount=Decimal('15.00'))
+        top = Bid.objects.create(listing=self.listing, bidder=bidder, amount=Decimal('20.00'))
+
+        out = StringIO()
+        call_command('reconcile_bid_stats', '--dry-run', stdout=out)
+        self.assertIn(f'{self.listing.pk}: 0 bids -> 2', out.getvalue())
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 0)
+
+        call_command('reconcile_bid_stats', stdout=out)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 2)
+        self.assertEqual(self.listing.top_bid, top)
+        self.assertEqual(self.listing.top_bidder, bidder)
+        self.assertEqual(self.listing.current_price, Decimal('20.00'))
+
+        # Removing every bid resets the stats
+        Bid.objects.all().delete()
+        call_command('reconcile_bid_stats', stdout=out)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 0)
+        self.assertIsNone(self.listing.top_bid)
+        self.assertIsNone(self.listing.current_price)
+
+    def test_deleting_top_bid_refreshes_stats(self):
+        """Test that removing the leading bid hands the lead back"""
+        bidder1 = User.objects.create_user(username='bidder1', password='testpass123')
+        bidder2 = User.objects.create_user(username='bidder2', password='testpass123')
+        for bidder, amount in ((bidder1, '15.00'), (bidder2, '20.00')):
+            self.listing.record_bid(Bid.objects.create(
+                listing=self.listing, bidder=bidder, amount=Decimal(amount)))
+
+        self.listing.top_bid.delete()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 1)
+        self.assertEqual(self.listing.top_bidder, bidder1)
+        self.assertEqual(self.listing.current_price, Decimal('15.00'))
+
+        self.listing.top_bid.delete()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 0)
+        self.assertIsNone(self.listing.top_bid)
+        self.assertIsNone(self.listing.top_bidder)
+
     def test_is_auction_ended_no_end_date(self):
         """Test auction with no end date is not ended"""
         self.assertFalse(self.listing.is_auction_ended())
@@ -162,7 +235,9 @@ class BidPlacementViewTest(TestCase):
         self.client.login(username='bidder', password='testpass123')
 
         # First bid
-        Bid.objects.create(listing=self.listing, bidder=self.bidder, amount=Decimal('15.00'))
+        self.listing.record_bid(Bid.objects.create(
+            listing=self.listing, bidder=self.bidder,
+            amount=Decimal('15.00')))
 
         # Try to place a bid that's too low (should be at least 16.00)
         response = self.client.post(
@@ -199,6 +274,18 @@ class BidPlacementViewTest(TestCase):
         self.listing.refresh_from_db()
         self.assertEqual(self.listing.current_price, Decimal('15.00'))
 
+    def test_place_bid_updates_bid_stats(self):
+        """Test that placing a bid updates the stored count and leader"""
+        self.client.login(username='bidder', password='testpass123')
+        url = reverse('marketplace:place_bid', kwargs={'pk': self.listing.pk})
+        self.client.post(url, {'amount': '15.00'})
+        self.client.post(url, {'amount': '18.00'})
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 2)
+        self.assertEqual(self.listing.top_bid, self.listing.get_highest_bid())
+        self.assertEqual(self.listing.top_bidder, self.bidder)
+
     def test_place_bid_invalid_amount(self):
         """Test that invalid bid amounts are rejected"""
         self.client.login(username='bidder', password='testpass123')
@@ -556,7 +643,8 @@ class BuyingPostViewTest(TestCase):
             buyer=self.buyer
         )
 
-        response = self.client.get(reverse('marketplace:marketplace_feed'))
+        response = self.client.get(
+            reverse('marketplace:marketplace_feed'), {'tab': 'buying'})
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Want Nintendo Switch')
 
@@ -787,6 +875,7 @@ class MarketplaceFeedTest(TestCase):
     """Test the complete marketplace feed"""
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.user1 = User.objects.create_user(username='user1', password='testpass123')
         self.user2 = User.objects.create_user(username='user2', password='testpass123')
@@ -818,9 +907,14 @@ class MarketplaceFeedTest(TestCase):
         response = self.client.get(reverse('marketplace:marketplace_feed'))
 
         self.assertEqual(response.status_code, 200)
-        self.assertContains(response, 'For Sale: Laptop')
-        self.assertContains(response, 'Want: iPhone')
         self.assertContains(response, 'Auction: Camera')
+        # The other tabs are fetched when opened
+        self.assertNotContains(response, 'For Sale: Laptop')
+        for tab, title in (('selling', 'For Sale: Laptop'),
+                           ('buying', 'Want: iPhone')):
+            response = self.client.get(
+                reverse('marketplace:marketplace_tab', args=[tab]))
+            self.assertContains(response, title)
 
     def test_my_listings_tab_shows_user_items(self):
         """Test that My Listings tab shows user's items"""
@@ -856,16 +950,144 @@ class MarketplaceFeedTest(TestCase):
             seller=self.user2
         )
 
-        response = self.client.get(reverse('marketplace:marketplace_feed'))
+        response = self.client.get(
+            reverse('marketplace:marketplace_tab', args=['mine']))
 
         self.assertContains(response, 'My Selling Post')
         self.assertContains(response, 'My Buying Post')
         self.assertContains(response, 'My Auction')
         # User2's item should not be in My Listings context
-        context = response.context
-        self.assertEqual(context['my_selling_posts'].count(), 1)
-        self.assertEqual(context['my_buying_posts'].count(), 1)
-        self.assertEqual(context['my_listings'].count(), 1)
+        self.assertNotContains(response, 'Other User Item')
+        sections = response.context['sections']
+        self.assertEqual(
+            [len(section['items']) for section in sections], [1, 1, 1])
+
+    def test_tab_keyset_pagination(self):
+        """Test that a tab pages through its items without overlap"""
+        for number in range(FEED_PAGE_SIZE + 2):
+            SellingPost.objects.create(
+                title=f'Item {number}', description='Test',
+                price=Decimal('5.00'), seller=self.user1)
+        url = reverse('marketplace:marketplace_tab', args=['selling'])
+        first = self.client.get(url)
+        self.assertEqual(len(first.context['items']), FEED_PAGE_SIZE)
+        second = self.client.get(first.context['next_url'])
+        self.assertEqual(len(second.context['items']), 2)
+        self.assertIsNone(second.context['next_url'])
+        titles = [
+            item.title
+            for item in first.context['items'] + second.context['items']
+        ]
+        self.assertEqual(
+            titles,
+            [f'Item {number}' for number in reversed(
+                range(FEED_PAGE_SIZE + 2))])
+
+    def test_feed_only_queries_visible_tab(self):
+        """Test that the first page loads just the visible tab"""
+        SellingPost.objects.create(
+            title='Hidden Item', description='Test',
+            price=Decimal('5.00'), seller=self.user1)
+        url = reverse('marketplace:marketplace_feed')
+        self.client.get(url)
+        # Counts are cached, so only the auctions page is queried
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertNotContains(response, 'Hidden Item')
+
+    def test_tab_counts_follow_new_items(self):
+        """Test that cached counts are dropped when an item is added"""
+        url = reverse('marketplace:marketplace_feed')
+        self.client.login(username='user1', password='testpass123')
+        self.assertEqual(
+            self.client.get(url).context['tab_counts'],
+            {'auctions': 0, 'selling': 0, 'buying': 0, 'mine': 0})
+        BuyingPost.objects.create(
+            title='Want', description='Test',
+            min_price=Decimal('5.00'), buyer=self.user1)
+        counts = self.client.get(url).context['tab_counts']
+        self.assertEqual(counts['buying'], 1)
+        self.assertEqual(counts['mine'], 1)
+
+    def create_bid_on_listings(self, count):
+        """Create ``count`` listings by user1, each bid on by user2."""
+        for number in range(count):
+            listing = Listing.objects.create(
+                title=f'Auction {number}', description='Test',
+                starting_price=Decimal('10.00'), seller=self.user1)
+            listing.record_bid(Bid.objects.create(
+                listing=listing, bidder=self.user2,
+                amount=Decimal('12.00') + number))
+
+    def test_auction_cards_cost_no_queries(self):
+        """Test that the auction tab's size doesn't change its queries"""
+        self.create_bid_on_listings(5)
+        url = reverse('marketplace:marketplace_feed')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, 'Current Bid:</strong> £16.00')
+
+    def test_my_listings_tab_queries(self):
+        """Test that My Listings costs one query per list"""
+        self.create_bid_on_listings(5)
+        self.client.login(username='user1', password='testpass123')
+        url = reverse('marketplace:marketplace_tab', args=['mine'])
+        # Session and user, then one query per list
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertContains(response, '£16.00 by user2')
+
+    def test_my_listings_page_queries(self):
+        """Test that the My Listings page costs one listings query"""
+        self.create_bid_on_listings(5)
+        self.client.login(username='user1', password='testpass123')
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('marketplace:my_listings'))
+        self.assertContains(response, '<strong>Total Bids:</strong> 1')
+        self.assertNotContains(response, 'bi-trash')
+
+    def test_my_bids_page_queries(self):
+        """Test that My Bids costs one bids query"""
+        self.create_bid_on_listings(5)
+        self.client.login(username='user2', password='testpass123')
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('marketplace:my_bids'))
+        self.assertContains(response, "You're winning!", count=5)
+
+    def test_listing_detail_reads_bid_stats_from_listing(self):
+        """Test that the detail page only queries bids for its bid list"""
+        self.create_bid_on_listings(1)
+        listing = Listing.objects.get()
+        self.client.login(username='user1', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('marketplace:listing_detail', args=[listing.pk]))
+        bid_queries = [
+            query for query in queries
+            if 'FROM "marketplace_bid"' in query['sql']
+        ]
+        self.assertEqual(len(bid_queries), 1)
+        self.assertEqual(response.context['minimum_bid'], Decimal('13.00'))
+
+    def test_delete_refused_without_querying_bids(self):
+        """Test that a bid-on listing can't be deleted"""
+        self.create_bid_on_listings(1)
+        listing = Listing.objects.get()
+        self.client.login(username='user1', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(
+                reverse('marketplace:delete_listing', args=[listing.pk]))
+        self.assertTrue(Listing.objects.filter(pk=listing.pk).exists())
+        self.assertFalse(any(
+            'FROM "marketplace_bid"' in query['sql'] for query in queries))
+
+    def test_unknown_and_private_tabs(self):
+        """Test that bad tabs and anonymous "mine" requests are 404s"""
+        for tab in ('nonsense', 'mine'):
+            response = self.client.get(
+                reverse('marketplace:marketplace_tab', args=[tab]))
+            self.assertEqual(response.status_code, 404)
 
 
 # ===== ACCEPTANCE BID TESTS =====
@@ -932,3 +1154,119 @@ class AcceptBidTest(TestCase):
         )
         self.assertEqual(notifications.count(), 1)
 
+    def test_closed_auction_cannot_be_accepted(self):
+        """Test that a bid can't be accepted once close_auctions ran"""
+        self.client.login(username='seller', password='testpass123')
+        url = reverse(
+            'marketplace:accept_bid', args=[self.listing.pk, self.bid.pk])
+        # The page was loaded before the auction closed
+        Listing.objects.filter(pk=self.listing.pk).update(
+            closed_at=timezone.now())
+
+        self.client.post(url)
+
+        self.listing.refresh_from_db()
+        self.assertFalse(self.listing.is_sold)
+        self.assertIsNone(self.listing.accepted_bid)
+
+
+
+class CloseAuctionsTest(TestCase):
+    """Test the close_auctions command"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='testpass123')
+        self.bidder = User.objects.create_user(username='bidder', password='testpass123')
+
+    def create_auction(self, amount=None, reserve_price=None, ends_in=-1):
+        listing = Listing.objects.create(
+            title='Test Auction', seller=self.seller,
+            starting_price=Decimal('10.00'), reserve_price=reserve_price,
+            ends_at=timezone.now() + timedelta(hours=ends_in))
+        if amount is not None:
+            listing.record_bid(Bid.objects.create(
+                listing=listing, bidder=self.bidder, amount=Decimal(amount)))
+        return listing
+
+    def close_auctions(self, *args):
+        out = StringIO()
+        call_command('close_auctions', '--force', *args, stdout=out)
+        return out.getvalue()
+
+    def test_winning_bid_is_accepted(self):
+        """Test that an ended auction is sold to its highest bidder"""
+        listing = self.create_auction('25.00')
+
+        self.assertIn('Closed 1 auctions, 1 sold.', self.close_auctions())
+        listing.refresh_from_db()
+        self.assertTrue(listing.is_sold)
+        self.assertEqual(listing.accepted_bid, listing.top_bid)
+        self.assertIsNotNone(listing.closed_at)
+        won = Notification.objects.get(notification_type='auction_won')
+        self.assertEqual(won.recipient, self.bidder)
+        self.assertEqual(won.related_listing, listing)
+        ended = Notification.objects.get(notification_type='auction_ended')
+        self.assertEqual(ended.recipient, self.seller)
+        self.assertIn('bidder won it with a bid of £25.00', ended.message)
+
+    def test_reserve_not_met(self):
+        """Test that a bid below the reserve doesn't win"""
+        listing = self.create_auction('25.00', reserve_price=Decimal('30.00'))
+
+        self.close_auctions()
+        listing.refresh_from_db()
+        self.assertFalse(listing.is_sold)
+        self.assertIsNone(listing.accepted_bid)
+        self.assertIsNotNone(listing.closed_at)
+        ended = Notification.objects.get()
+        self.assertEqual(ended.recipient, self.seller)
+        self.assertIn('reserve price of £30.00', ended.message)
+
+    def test_no_bids(self):
+        """Test that the seller is told when nobody bid"""
+        listing = self.create_auction()
+
+        self.close_auctions()
+        listing.refresh_from_db()
+        self.assertFalse(listing.is_sold)
+        self.assertIsNotNone(listing.closed_at)
+        self.assertIn('without any bids', Notification.objects.get().message)
+
+    def test_running_and_sold_auctions_are_left_alone(self):
+        """Test that only ended, unsold auctions are closed"""
+        running = self.create_auction('25.00', ends_in=1)
+        sold = self.create_auction('25.00')
+        Listing.objects.filter(pk=sold.pk).update(is_sold=True)
+
+        self.assertIn('Closed 0 auctions', self.close_auctions())
+        running.refresh_from_db()
+        self.assertIsNone(running.closed_at)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_closing_is_idempotent(self):
+        """Test that a second run doesn't notify anyone again"""
+        for _ in range(5):
+            self.create_auction('25.00')
+
+        self.assertIn('Closed 5 auctions, 5 sold.', self.close_auctions('--batch-size', '2'))
+        self.assertIn('Closed 0 auctions', self.close_auctions())
+        self.assertEqual(Notification.objects.count(), 10)
+
+    def test_batch_queries(self):
+        """Test that a batch costs the same queries whatever its size"""
+        def count_queries(auctions):
+            for _ in range(auctions):
+                self.create_auction('25.00')
+            with CaptureQueriesContext(connection) as queries:
+                self.close_auctions()
+            return len(queries)
+
+        self.close_auctions()  # Creates the job
+        self.assertEqual(count_queries(1), count_queries(5))
+
+    def test_not_due(self):
+        """Test that the job only runs once a minute without --force"""
+        call_command('close_auctions', stdout=StringIO())
+        out = StringIO()
+        call_command('close_auctions', stdout=out)
+        self.assertIn('not due yet', out.getvalue())
@@ -6,6 +6,7 @@ app_name = 'marketplace'
 urlpatterns = [
     # Main marketplace feed
     path('', views.marketplace_feed, name='marketplace_feed'),
+    path('tab/<str:tab>/', views.marketplace_tab, name='marketplace_tab'),
 
     # Selling posts (classifieds)
     path(
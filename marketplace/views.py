@@ -1,52 +1,207 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import Q
+from django.http import Http404
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import urlencode
+from datetime import datetime
 from decimal import Decimal, InvalidOperation
+from events.images import optimise_image
+from .caching import (
+    TAB_COUNTS_KEY, TAB_COUNTS_TIMEOUT_SECONDS, my_items_count_key
+)
 from .models import (
     SellingPost, BuyingPost, MarketComment, Bid, Listing, Notification
 )
 
 
+# Items per page of a feed tab
+FEED_PAGE_SIZE = 12
+
+FEED_TABS = ('auctions', 'selling', 'buying', 'mine')
+
+
+def _uploaded_image(request):
+    """The request's image upload, shrunk for Cloudinary, or None."""
+    image = request.FILES.get('image')
+    return optimise_image(image) if image else None
+
+
+def _feed_items(kind):
+    """Newest-first queryset behind one feed tab."""
+    return {
+        'auctions': Listing.objects.select_related('seller').with_bid_stats(),
+        'selling': SellingPost.objects.select_related('seller'),
+        'buying': BuyingPost.objects.select_related('buyer'),
+    }[kind].order_by('-created_at', '-pk')
+
+
+# Field holding the owner of each kind of item
+OWNER_FIELDS = {'auctions': 'seller', 'selling': 'seller', 'buying': 'buyer'}
+
+
+def _feed_cursor(item):
+    """Keyset cursor pointing just after ``item`` in a feed tab."""
+    return f"{item.created_at.isoformat()}|{item.pk}"
+
+
+def _feed_after(items, cursor):
+    """
+    Filter newest-first ``items`` to those after ``cursor``. A malformed
+    cursor starts from the beginning.
+    """
+    try:
+        created_at, pk = cursor.rsplit("|", 1)
+        created_at, pk = datetime.fromisoformat(created_at), int(pk)
+    except ValueError:
+        return items
+    return items.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+
+def _feed_page(request, kind, owner=None):
+    """
+    Context for one keyset-paginated page of a feed tab, limited to
+    ``owner``'s items when given.
+    """
+    items = _feed_items(kind)
+    if owner is not None:
+        items = items.filter(**{OWNER_FIELDS[kind]: owner})
+    after = request.GET.get('after', '')
+    # Fetch one extra row to learn whether there is a next page
+    items = list(_feed_after(items, after)[:FEED_PAGE_SIZE + 1])
+    next_url = None
+    if len(items) > FEED_PAGE_SIZE:
+        items = items[:FEED_PAGE_SIZE]
+        params = {'after': _feed_cursor(items[-1])}
+        if owner is not None:
+            params['mine'] = 1
+        next_url = (
+            reverse('marketplace:marketplace_tab', args=[kind]) + "?" +
+            urlencode(params)
+        )
+    return {
+        'kind': kind,
+        'items': items,
+        'next_url': next_url,
+        'is_first_page': not after,
+        'mine': owner is not None,
+    }
+
+
+def _tab_context(request, tab):
+    """Context for the first or a later page of ``tab``."""
+    if tab == 'mine':
+        return {
+            'sections': [
+                _feed_page(request, kind, request.user)
+                for kind in OWNER_FIELDS
+            ],
+        }
+    owner = None
+    if request.GET.get('mine') and request.user.is_authenticated:
+        owner = request.user
+    return _feed_page(request, tab, owner)
+
+
+def _tab_counts(user):
+    """Item counts shown on the feed tabs, cached between changes."""
+    counts = cache.get(TAB_COUNTS_KEY)
+    if counts is None:
+        counts = {
+            kind: _feed_items(kind).order_by().count()
+            for kind in OWNER_FIELDS
+        }
+        cache.set(TAB_COUNTS_KEY, counts, TAB_COUNTS_TIMEOUT_SECONDS)
+    if user.is_authenticated:
+        key = my_items_count_key(user.pk)
+        mine = cache.get(key)
+        if mine is None:
+            mine = sum(
+                _feed_items(kind).filter(**{owner: user}).order_by().count()
+                for kind, owner in OWNER_FIELDS.items()
+            )
+            cache.set(key, mine, TAB_COUNTS_TIMEOUT_SECONDS)
+        counts = {**counts, 'mine': mine}
+    return counts
+
+
+def _requested_tab(request, tab):
+    """Validate a tab name, which for "mine" needs a signed-in user."""
+    mine = tab == 'mine' or request.GET.get('mine')
+    if tab not in FEED_TABS or (mine and not request.user.is_authenticated):
+        raise Http404("No such marketplace tab.")
+    return tab
+
+
 def marketplace_feed(request):
-    selling_posts = SellingPost.objects.all().order_by('-created_at')
-    buying_posts = BuyingPost.objects.all().order_by('-created_at')
-    listings = Listing.objects.all().order_by('-created_at')
-
-    # Get user's listings if authenticated
-    my_listings = []
-    my_selling_posts = []
-    my_buying_posts = []
-    if request.user.is_authenticated:
-        my_listings = Listing.objects.filter(
-            seller=request.user
-        ).order_by('-created_at')
-        my_selling_posts = SellingPost.objects.filter(
-            seller=request.user
-        ).order_by('-created_at')
-        my_buying_posts = BuyingPost.objects.filter(
-            buyer=request.user
-        ).order_by('-created_at')
+    """
+    Display the marketplace with its auction, for sale, wanted and (when
+    signed in) my items tabs.
+
+    Only the tab picked with ``?tab=`` (auctions by default) is rendered;
+    the others are fetched from marketplace_tab when first opened.
 
+    **Context**
+
+    ``tab``
+        The visible tab.
+    ``tab_counts``
+        Item counts for the tab badges.
+    ``kind``, ``items``, ``next_url``, ``is_first_page``, ``sections``
+        The first page of the visible tab, as for marketplace_tab.
+
+    **Template**
+
+    :template:`marketplace/marketplace_feed.html`
+    """
+    tab = request.GET.get('tab', 'auctions')
+    if tab not in FEED_TABS or (
+            tab == 'mine' and not request.user.is_authenticated):
+        tab = 'auctions'
     context = {
-        'selling_posts': selling_posts,
-        'buying_posts': buying_posts,
-        'listings': listings,
-        'my_listings': my_listings,
-        'my_selling_posts': my_selling_posts,
-        'my_buying_posts': my_buying_posts,
+        'tab': tab,
+        'tab_counts': _tab_counts(request.user),
+        'tabs': FEED_TABS,
     }
+    context.update(_tab_context(request, tab))
     return render(request, 'marketplace/marketplace_feed.html', context)
 
 
+def marketplace_tab(request, tab):
+    """
+    Render one keyset-paginated page of a feed tab as a fragment, for
+    the tab's first opening and its "Load more" button.
+
+    ``?after=`` continues after a cursor and ``?mine=1`` limits a tab to
+    the user's own items.
+
+    **Template**
+
+    :template:`marketplace/feed_tab.html`
+    """
+    tab = _requested_tab(request, tab)
+    context = {'tab': tab}
+    context.update(_tab_context(request, tab))
+    return render(request, 'marketplace/feed_tab.html', context)
+
+
 @login_required
 def create_selling_post(request):
     if request.method == 'POST':
         title = request.POST['title']
         description = request.POST['description']
         price = request.POST['price']
-        image = request.FILES.get('image')
+        try:
+            image = _uploaded_image(request)
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+            return render(request, 'marketplace/create_selling_post.html')
         seller = request.user
 
         SellingPost.objects.create(
@@ -68,7 +223,11 @@ def create_buying_post(request):
         title = request.POST['title']
         description = request.POST['description']
         min_price = request.POST['min_price']
-        image = request.FILES.get('image')
+        try:
+            image = _uploaded_image(request)
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+            return render(request, 'marketplace/create_buying_post.html')
         buyer = request.user
 
         BuyingPost.objects.create(
@@ -93,9 +252,9 @@ def create_listing(request):
         reserve_price = request.POST.get('reserve_price')
         min_increment = request.POST.get('min_increment', '1.00')
         ends_at = request.POST.get('ends_at')
-        image = request.FILES.get('image')
 
         try:
+            image = _uploaded_image(request)
             listing = Listing.objects.create(
                 title=title,
                 description=description,
@@ -112,6 +271,8 @@ def create_listing(request):
             return redirect('marketplace:listing_detail', pk=listing.pk)
         except (ValueError, InvalidOperation) as e:
             messages.error(request, f'Invalid input: {str(e)}')
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
 
     return render(request, 'marketplace/create_listing.html')
 
@@ -119,9 +280,10 @@ def create_listing(request):
 @login_required
 def listing_detail(request, pk):
     """Display a single listing with all bids"""
-    listing = get_object_or_404(Listing, pk=pk)
+    listing = get_object_or_404(
+        Listing.objects.select_related('seller', 'top_bid__bidder'), pk=pk)
     bids = listing.bids.all()[:10]  # Show top 10 bids
-    highest_bid = listing.get_highest_bid()
+    highest_bid = listing.top_bid
     minimum_bid = listing.get_minimum_bid()
     is_ended = listing.is_auction_ended()
 
@@ -199,9 +361,9 @@ def place_bid(request, pk):
                 amount=amount
             )
 
-            # Update denormalized current_price for performance
-            listing.current_price = amount
-            listing.save(update_fields=['current_price', 'updated_at'])
+            # Update the denormalized price, count and leader while the
+            # row is still locked
+            listing.record_bid(bid)
 
             messages.success(
                 request,
@@ -222,7 +384,7 @@ def my_bids(request):
     """Show all bids placed by the current user"""
     bids = Bid.objects.filter(
         bidder=request.user
-    ).select_related('listing').order_by('-created_at')
+    ).select_related('listing__top_bid').order_by('-created_at')
     context = {
         'bids': bids,
     }
@@ -234,7 +396,7 @@ def my_listings(request):
     """Show all listings created by the current user"""
     listings = Listing.objects.filter(
         seller=request.user
-    ).order_by('-created_at')
+    ).with_bid_stats().order_by('-created_at')
     context = {
         'listings': listings,
     }
@@ -324,6 +486,12 @@ def accept_bid(request, listing_pk, bid_pk):
     # Accept the bid
     try:
         with transaction.atomic():
+            # Lock the listing so close_auctions can't close it in between
+            listing = Listing.objects.select_for_update().get(pk=listing_pk)
+            if listing.is_sold or listing.closed_at is not None:
+                messages.error(request, "This auction has already closed.")
+                return redirect('marketplace:listing_detail', pk=listing_pk)
+
             listing.accepted_bid = bid
             listing.is_sold = True
             listing.save(
@@ -378,7 +546,7 @@ def delete_listing(request, pk):
         return redirect('marketplace:listing_detail', pk=pk)
 
     # Prevent deletion if bids exist
-    if listing.bids.exists():
+    if listing.top_bid_id is not None:
         messages.error(request, "Cannot delete listing with existing bids.")
         return redirect('marketplace:listing_detail', pk=pk)
 